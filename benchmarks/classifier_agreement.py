@@ -0,0 +1,108 @@
+"""
+Compares the embedding-prototype classifier against the deberta NLI classifier on the bundled attachments.
+
+Every attachment is parsed and chunked with rag.py's chunker, categories and category descriptions, so
+the chunks are the ones production makes. Both classifier modes label every chunk, and the script reports
+overall and per-label agreement, the confusion matrix and the time each mode took.
+
+Usage (from the repository root):
+    python -m benchmarks.classifier_agreement
+    python -m benchmarks.classifier_agreement --attachments attachments --output agreement.json
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter, defaultdict
+import rag
+from classes.pdf_parser import PDF_Parser
+from classes.vector_store import Vector_Store
+from classes.zero_shot_classifier import Zero_Shot_Classifier
+
+def load_chunks(attachments_dir, chunk_size, tokenizer):
+    """
+    Parses and chunks every PDF in attachments_dir with rag.chunk_page.
+
+    Returns:
+        list[tuple[str, str]]: (source filename, chunk text) pairs.
+    """
+    pdf_parser = PDF_Parser()
+    chunks = []
+    for pdf_location in sorted(glob.glob(os.path.join(attachments_dir, "*.pdf"))):
+        source = os.path.basename(pdf_location)
+        for page_number, page_text in pdf_parser.iter_pages(pdf_location):
+            if page_text.strip():
+                chunks.extend((source, chunk) for chunk in rag.chunk_page(page_text, chunk_size, tokenizer))
+    return chunks
+
+def timed_classify(classifier, texts):
+    """
+    Classifies texts and returns the labels with the wall time taken.
+    """
+    start = time.perf_counter()
+    labels = [label for label, _ in classifier.classify_bulk(texts)]
+    return labels, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Report agreement between the embedding and NLI classifier modes.")
+    parser.add_argument("--attachments", default="attachments", help="Directory of PDFs to classify.")
+    parser.add_argument("--chunk-size", type=int, help="Chunk size in the unit of rag.py's chunker (tokens or characters), defaults to its setting.")
+    parser.add_argument("--output", help="Optional path to also write the report as JSON.")
+    args = parser.parse_args()
+    categories = rag.categories
+
+    # A throwaway store provides the embedding model and its tokenizer, as in rag.init()
+    storage_path = tempfile.mkdtemp(prefix="classifier_agreement_")
+    try:
+        vector_store = Vector_Store(storage_path)
+        chunk_method, chunk_size, tokenizer = rag.resolve_chunking(vector_store)
+        chunk_size = args.chunk_size or chunk_size
+        chunks = load_chunks(args.attachments, chunk_size, tokenizer)
+        texts = [text for _, text in chunks]
+        print(f"Classifying {len(texts)} chunks ({chunk_method}, {chunk_size} per chunk) from {args.attachments}...")
+
+        embedding_classifier = Zero_Shot_Classifier(categories, mode="embedding", embedding_function=vector_store.embedding_function, label_descriptions=rag.category_descriptions)
+        nli_classifier = Zero_Shot_Classifier(categories)
+
+        embedding_labels, embedding_seconds = timed_classify(embedding_classifier, texts)
+        nli_labels, nli_seconds = timed_classify(nli_classifier, texts)
+    finally:
+        vector_store = None
+        shutil.rmtree(storage_path, ignore_errors=True)
+
+    confusion = defaultdict(Counter)
+    per_source = defaultdict(Counter)
+    for (source, _), nli_label, embedding_label in zip(chunks, nli_labels, embedding_labels):
+        confusion[nli_label][embedding_label] += 1
+        per_source[source]["total"] += 1
+        per_source[source]["agree"] += nli_label == embedding_label
+
+    agree = sum(confusion[label][label] for label in categories)
+    report = {
+        "chunks": len(texts),
+        "chunker": {"method": chunk_method, "size": chunk_size},
+        "agreement": agree / len(texts) if texts else 0.0,
+        "per_label_agreement": {
+            label: (confusion[label][label] / sum(confusion[label].values())) if confusion[label] else None
+            for label in categories
+        },
+        "per_source_agreement": {source: counts["agree"] / counts["total"] for source, counts in per_source.items()},
+        # Rows are the NLI labels, columns the embedding labels
+        "confusion_matrix": {label: {other: confusion[label][other] for other in categories} for label in categories},
+        "seconds": {"embedding": embedding_seconds, "nli": nli_seconds},
+        "chunks_per_second": {
+            "embedding": len(texts) / embedding_seconds if embedding_seconds else None,
+            "nli": len(texts) / nli_seconds if nli_seconds else None
+        }
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+A lightweight stand-in for the Ollama HTTP API, for load testing the query path without a real model.
+
+It answers /api/generate and /api/chat with newline-delimited JSON streams (or a single JSON object
+when "stream" is false) in the same shape Ollama uses. The first token arrives after a fixed latency
+plus a prefill time proportional to the prompt length, and the remaining tokens are paced at a
+configurable rate. /api/tags, /api/version and /api/show are answered so clients that probe the
+server work unchanged.
+
+Usage (from the repository root):
+    python -m benchmarks.fake_ollama --port 11435 --tokens-per-second 40 --first-token-latency 0.2
+    OLLAMA_HOST=http://127.0.0.1:11435 python rag.py --query-only
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER_WORDS = (
+    "The retrieved information indicates that the contractor must provide the requested services "
+    "according to the schedule described on the referenced pages of the solicitation document"
+).split()
+
+class Fake_Ollama_Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, tokens_per_second=40.0, first_token_latency=0.2,
+                 prefill_tokens_per_second=2000.0, response_tokens=128, think=False):
+        """
+        Initializes the fake Ollama server. Port 0 picks a free port, see base_url.
+
+        Args:
+            host (str): The interface to listen on.
+            port (int): The port to listen on.
+            tokens_per_second (float): Generation speed once the first token has been produced.
+            first_token_latency (float): Fixed seconds before the first token, on top of prefill.
+            prefill_tokens_per_second (float): Prompt evaluation speed, prompt tokens estimated at four characters each.
+            response_tokens (int): Tokens in every response.
+            think (bool): Whether responses start with a <think> block, like reasoning models.
+        """
+        super().__init__((host, port), Fake_Ollama_Handler)
+        self.tokens_per_second = tokens_per_second
+        self.first_token_latency = first_token_latency
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.response_tokens = response_tokens
+        self.think = think
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def response_pieces(self):
+        """
+        Returns the token strings of a response.
+        """
+        pieces = ["<think>", "Checking", " the", " context.", "</think>", "\n\n"] if self.think else []
+        pieces.extend((" " if i else "") + FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(self.response_tokens))
+        return pieces
+
+    def start(self):
+        """
+        Serves requests on a background thread and returns self.
+        """
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops a server started with start.
+        """
+        self.shutdown()
+        self.server_close()
+
+class Fake_Ollama_Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Per-request logging would swamp a load test
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": []})
+        elif self.path == "/api/version":
+            self._send_json(200, {"version": "0.0.0-fake"})
+        elif self.path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+        except ValueError:
+            self._send_json(400, {"error": "invalid JSON body"})
+            return
+        if self.path == "/api/generate":
+            self._generate(request, request.get("prompt", ""), chat=False)
+        elif self.path == "/api/chat":
+            prompt = "".join(message.get("content", "") for message in request.get("messages", []))
+            self._generate(request, prompt, chat=True)
+        elif self.path == "/api/show":
+            self._send_json(200, {"modelfile": "", "parameters": "", "template": "", "details": {"family": "fake"}})
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def _chunk(self, model, text, chat, done, **extra):
+        chunk = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+        if chat:
+            chunk["message"] = {"role": "assistant", "content": text}
+        else:
+            chunk["response"] = text
+        chunk.update(extra)
+        return chunk
+
+    def _generate(self, request, prompt, chat):
+        """
+        Produces a response paced like a real model, streamed as NDJSON unless streaming was disabled.
+        """
+        server = self.server
+        model = request.get("model", "fake")
+        start = time.perf_counter()
+        prompt_tokens = max(1, len(prompt) // 4)
+        pieces = server.response_pieces()
+
+        # Prefill: fixed latency plus time proportional to the prompt
+        prefill_seconds = server.first_token_latency + prompt_tokens / server.prefill_tokens_per_second
+        time.sleep(prefill_seconds)
+        token_interval = 1.0 / server.tokens_per_second if server.tokens_per_second > 0 else 0.0
+
+        def final_chunk():
+            total = time.perf_counter() - start
+            return self._chunk(
+                model, "", chat, True,
+                done_reason="stop",
+                total_duration=int(total * 1e9),
+                load_duration=0,
+                prompt_eval_count=prompt_tokens,
+                prompt_eval_duration=int(prefill_seconds * 1e9),
+                eval_count=len(pieces),
+                eval_duration=int((total - prefill_seconds) * 1e9)
+            )
+
+        if request.get("stream", True) is False:
+            time.sleep(token_interval * max(0, len(pieces) - 1))
+            response = final_chunk()
+            if chat:
+                response["message"]["content"] = "".join(pieces)
+            else:
+                response["response"] = "".join(pieces)
+            self._send_json(200, response)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_line(payload):
+            line = (json.dumps(payload) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for i, piece in enumerate(pieces):
+                if i:
+                    time.sleep(token_interval)
+                write_line(self._chunk(model, piece, chat, False))
+            write_line(final_chunk())
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the stream
+            pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Ollama API for load testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="Generation speed after the first token.")
+    parser.add_argument("--first-token-latency", type=float, default=0.2, help="Fixed seconds before the first token.")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000.0, help="Prompt evaluation speed.")
+    parser.add_argument("--response-tokens", type=int, default=128, help="Tokens in every response.")
+    parser.add_argument("--think", action="store_true", help="Start every response with a <think> block.")
+    args = parser.parse_args()
+
+    server = Fake_Ollama_Server(
+        args.host, args.port,
+        tokens_per_second=args.tokens_per_second,
+        first_token_latency=args.first_token_latency,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        response_tokens=args.response_tokens,
+        think=args.think
+    )
+    print(f"Fake Ollama listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Measures ingest throughput over the bundled attachments, stage by stage.
+
+Every attachment is parsed with PDF_Parser, chunked with rag.chunk_page using the chunker rag.resolve_chunking
+picks, classified with Zero_Shot_Classifier.classify_bulk into rag.py's categories, optionally summarized
+with Summarizer.bulk_summarize and written with Vector_Store.add_documents into a throwaway vector store,
+the same stages index_document runs. Each stage is timed on its own and the script reports wall time,
+pages per second, chunks per second and peak RSS as JSON, optionally comparing against a saved baseline.
+
+Everything runs on the CPU. --offline stops Hugging Face from touching the network, so the models must
+already be cached, and --stub-models swaps every model for a hashed bag-of-words stand-in so the run
+needs no model downloads at all and finishes at CI speed. The token chunker's tokenizer ships with the
+embedding model, so --stub-models runs chunk by characters, as rag.py does without a tokenizer. Smaller Hugging Face models can be tried with
+--classifier-model and --summarizer-model.
+
+Usage (from the repository root):
+    python -m benchmarks.ingest_benchmark --stub-models
+    python -m benchmarks.ingest_benchmark --stub-models --save-baseline benchmarks/ingest_baseline.json
+    python -m benchmarks.ingest_benchmark --stub-models --baseline benchmarks/ingest_baseline.json --fail-on-regression
+    python -m benchmarks.ingest_benchmark --summarize --offline --output ingest.json
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+import numpy as np
+
+# Pin everything to the CPU before any model library is imported
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+import rag
+from classes.util import Util
+from classes.pdf_parser import PDF_Parser
+from classes.zero_shot_classifier import Zero_Shot_Classifier, MODES
+from classes.summarizer import Summarizer
+from classes.vector_store import Vector_Store
+
+class Stub_Embedding_Function:
+    """
+    A hashed bag-of-words embedding, standing in for the ONNX model in --stub-models runs.
+    """
+    MODEL_NAME = "stub-hashed-bow"
+
+    def __init__(self, dimensions=384):
+        self.dimensions = dimensions
+
+    def __call__(self, input):
+        embeddings = []
+        for text in input:
+            vector = np.zeros(self.dimensions, dtype=np.float32)
+            for word in text.lower().split():
+                vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dimensions] += 1.0
+            norm = np.linalg.norm(vector)
+            embeddings.append(vector / norm if norm else vector)
+        return embeddings
+
+class Stub_Summarizer:
+    """
+    Keeps the leading words of each chunk, standing in for the summarization model in --stub-models runs.
+    """
+    def bulk_summarize(self, texts, max_length=150, min_length=50, batch_size=8):
+        return [" ".join(text.split()[:max_length]) for text in texts]
+
+    def unload(self):
+        pass
+
+class RSS_Sampler:
+    """
+    Tracks the peak resident set size of this process while a stage runs.
+
+    psutil is sampled on a background thread when it is installed, otherwise the process high-water
+    mark from the resource module is used, which only ever grows across stages.
+    """
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        try:
+            import psutil
+            self.process = psutil.Process()
+        except ImportError:
+            self.process = None
+
+    @staticmethod
+    def high_water_mark():
+        """
+        Returns the process's peak RSS in bytes from the resource module, or None where it is unavailable.
+        """
+        try:
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    def _sample(self):
+        while not self.stop_event.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            self.stop_event.wait(self.interval)
+
+    def __enter__(self):
+        if self.process is not None:
+            self.peak = self.process.memory_info().rss
+            self.thread = threading.Thread(target=self._sample, daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.peak = max(self.peak, self.process.memory_info().rss)
+        else:
+            self.peak = self.high_water_mark() or 0
+        return False
+
+def timed_stage(report, name, function, pages=None, chunks=None):
+    """
+    Runs one stage, recording its wall time, throughput and peak RSS under report["stages"][name].
+
+    Returns:
+        The stage function's result.
+    """
+    with RSS_Sampler() as sampler:
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+    stage = {"seconds": seconds, "peak_rss_mb": sampler.peak / (1024 * 1024)}
+    if pages is not None:
+        stage["pages"] = pages() if callable(pages) else pages
+        stage["pages_per_second"] = stage["pages"] / seconds if seconds else None
+    if chunks is not None:
+        stage["chunks"] = chunks() if callable(chunks) else chunks
+        stage["chunks_per_second"] = stage["chunks"] / seconds if seconds else None
+    report["stages"][name] = stage
+    print(f"{name}: {seconds:.2f}s")
+    return result
+
+def compare(report, baseline, tolerance, min_seconds):
+    """
+    Compares each stage's wall time with the baseline. Stages faster than min_seconds in both runs are
+    reported but never counted as regressions, as their timings are mostly noise.
+
+    Returns:
+        dict: Per-stage baseline seconds, current seconds, ratio and whether it regressed beyond tolerance.
+    """
+    comparison = {}
+    for name, stage in report["stages"].items():
+        baseline_stage = baseline.get("stages", {}).get(name)
+        if not baseline_stage or not baseline_stage.get("seconds"):
+            continue
+        ratio = stage["seconds"] / baseline_stage["seconds"]
+        comparison[name] = {
+            "baseline_seconds": baseline_stage["seconds"],
+            "seconds": stage["seconds"],
+            "ratio": ratio,
+            "regressed": ratio > 1 + tolerance and max(stage["seconds"], baseline_stage["seconds"]) >= min_seconds
+        }
+    return comparison
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each ingest stage over the bundled attachments.")
+    parser.add_argument("--attachments", default="attachments", help="Directory of PDFs to ingest.")
+    parser.add_argument("--chunk-size", type=int, help="Chunk size in the unit of rag.py's chunker (tokens or characters), defaults to its setting.")
+    parser.add_argument("--classifier-mode", choices=MODES, default=rag.classifier_mode, help="Classifier mode, defaults to rag.py's.")
+    parser.add_argument("--classifier-model", default="MoritzLaurer/deberta-v3-large-zeroshot-v2.0", help="NLI model, a smaller one speeds up the run.")
+    parser.add_argument("--summarize", action="store_true", help="Also benchmark Summarizer.bulk_summarize.")
+    parser.add_argument("--summarizer-model", default="facebook/bart-large-cnn", help="Summarization model, a smaller one speeds up the run.")
+    parser.add_argument("--stub-models", action="store_true", help="Replace every model with a fast stand-in, needs no downloads.")
+    parser.add_argument("--offline", action="store_true", help="Forbid Hugging Face network access, models must already be cached.")
+    parser.add_argument("--baseline", help="A previous report to compare stage wall times against.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Slowdown ratio over the baseline that counts as a regression.")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="Stages shorter than this in both runs never count as regressions.")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 if any stage regressed.")
+    parser.add_argument("--save-baseline", help="Write this run's report to the given path for later comparisons.")
+    parser.add_argument("--output", help="Optional path to also write the report as JSON.")
+    args = parser.parse_args()
+
+    if args.offline:
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+    categories = rag.categories
+    storage_path = tempfile.mkdtemp(prefix="ingest_benchmark_")
+    try:
+        # Opened first, its embedding model decides how the pages are chunked
+        vector_store = Vector_Store(storage_path)
+        if args.stub_models:
+            vector_store.embedding_function = Stub_Embedding_Function()
+        chunk_method, chunk_size, tokenizer = rag.resolve_chunking(vector_store)
+        chunk_size = args.chunk_size or chunk_size
+
+        pdf_locations = sorted(glob.glob(os.path.join(args.attachments, "*.pdf")))
+        report = {
+            "settings": {
+                "attachments": [os.path.basename(location) for location in pdf_locations],
+                "chunker": chunk_method,
+                "chunk_size": chunk_size,
+                "classifier_mode": "embedding" if args.stub_models else args.classifier_mode,
+                "summarize": args.summarize,
+                "stub_models": args.stub_models,
+                "python": platform.python_version(),
+                "cpus": os.cpu_count()
+            },
+            "stages": {}
+        }
+
+        # 1. Parse
+        pdf_parser = PDF_Parser()
+        pages = []
+        def parse():
+            for pdf_location in pdf_locations:
+                source = os.path.basename(pdf_location)
+                pages.extend((source, page_number, page_text) for page_number, page_text in pdf_parser.iter_pages_parallel(pdf_location))
+        timed_stage(report, "parse", parse, pages=lambda: len(pages))
+
+        # 2. Chunk
+        chunks = []
+        def chunk():
+            for source, page_number, page_text in pages:
+                if page_text.strip():
+                    chunks.extend((source, page_number, text) for text in rag.chunk_page(page_text, chunk_size, tokenizer))
+        timed_stage(report, "chunk", chunk, pages=len(pages), chunks=lambda: len(chunks))
+        texts = [text for _, _, text in chunks]
+        print(f"Benchmarking {len(texts)} chunks from {len(pages)} pages...")
+
+        # 3. Classify, model loading is timed separately so it does not skew throughput
+        def load_classifier():
+            if args.stub_models or args.classifier_mode == "embedding":
+                # Embedding mode builds its prototypes up front and has no model of its own to load
+                return Zero_Shot_Classifier(categories, mode="embedding", embedding_function=vector_store.embedding_function, label_descriptions=rag.category_descriptions)
+            classifier = Zero_Shot_Classifier(categories, model_name=args.classifier_model)
+            classifier.load()
+            return classifier
+        classifier = timed_stage(report, "classifier_load", load_classifier)
+        classifications = timed_stage(report, "classify", lambda: classifier.classify_bulk(texts), chunks=len(texts))
+        classifier.unload()
+
+        # 4. Summarize
+        documents = texts
+        if args.summarize:
+            summarizer = Stub_Summarizer() if args.stub_models else Summarizer(model_name=args.summarizer_model)
+            if not args.stub_models:
+                timed_stage(report, "summarizer_load", summarizer.load)
+            documents = timed_stage(report, "summarize", lambda: summarizer.bulk_summarize(texts), chunks=len(texts))
+            summarizer.unload()
+
+        # 5. Embed and write
+        vector_store.create_collections(categories)
+        by_label = defaultdict(list)
+        for index, (label, score) in enumerate(classifications):
+            by_label[label].append(index)
+        def upsert():
+            for label, indexes in by_label.items():
+                vector_store.add_documents(
+                    label,
+                    [documents[i] for i in indexes],
+                    [{"source": chunks[i][0], "page_number": chunks[i][1], "classification": label, "confidence": classifications[i][1]} for i in indexes],
+                    [f"{i}-{Util.generate_hash(texts[i])}" for i in indexes]
+                )
+        timed_stage(report, "add_documents", upsert, chunks=len(texts))
+    finally:
+        shutil.rmtree(storage_path, ignore_errors=True)
+
+    total_seconds = sum(stage["seconds"] for stage in report["stages"].values())
+    report["total"] = {
+        "seconds": total_seconds,
+        "pages": len(pages),
+        "chunks": len(texts),
+        "pages_per_second": len(pages) / total_seconds if total_seconds else None,
+        "chunks_per_second": len(texts) / total_seconds if total_seconds else None,
+        "peak_rss_mb": max(stage["peak_rss_mb"] for stage in report["stages"].values())
+    }
+
+    regressed = False
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != report["settings"]:
+            print("Warning: the baseline was recorded with different settings, the comparison may not be meaningful")
+        report["comparison"] = compare(report, baseline, args.tolerance, args.min_seconds)
+        regressed = any(stage["regressed"] for stage in report["comparison"].values())
+
+    print(json.dumps(report, indent=2))
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+    if regressed:
+        print("Regression: " + ", ".join(name for name, stage in report["comparison"].items() if stage["regressed"]))
+        if args.fail_on_regression:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
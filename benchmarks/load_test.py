@@ -0,0 +1,202 @@
+"""
+Replays a file of queries against rag.process_user_query at a fixed concurrency and reports latency.
+
+Each request records the time spent on retrieval, prompt building and generation. The report gives
+p50/p90/p95/p99 and a latency histogram for each phase and for the whole request, plus throughput,
+as JSON. By default the Ollama calls go to an in-process fake server (see benchmarks/fake_ollama.py)
+with a configurable token rate and latency, so no real model is needed. Pass --base-url to target a
+real Ollama server instead.
+
+Retrieval runs against the vector store configured in rag.py, which must already be indexed (run
+rag.py once first). The answer cache is bypassed unless --answer-cache is given, so repeated queries
+still exercise generation.
+
+Usage (from the repository root):
+    python -m benchmarks.load_test --queries queries.txt --concurrency 8 --requests 200
+    python -m benchmarks.load_test --concurrency 4 --tokens-per-second 30 --first-token-latency 0.5 --output load.json
+    python -m benchmarks.load_test --base-url http://localhost:11434 --concurrency 2
+"""
+import argparse
+import contextlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from benchmarks.fake_ollama import Fake_Ollama_Server
+
+# Used when no query file is given
+default_queries = [
+    "What is the scope of work for this project?",
+    "What are the mandatory requirements for respondents?",
+    "When are submissions due and how should they be delivered?",
+    "What technical requirements does the reservation system have?",
+    "How will responses be evaluated?",
+    "What insurance does the contractor need?",
+    "Which payment methods must the system support?",
+    "Who is the point of contact for questions?"
+]
+
+# Histogram bucket upper bounds in milliseconds, the last bucket is open-ended
+bucket_bounds_ms = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 60000]
+
+phases = ["retrieval", "prompt", "generation", "total"]
+
+class Bypassed_Answer_Cache:
+    """
+    Stands in for rag.answer_cache so every request reaches the LLM.
+    """
+    def __init__(self, answer_cache):
+        self.make_key = answer_cache.make_key
+
+    def get(self, key):
+        return None
+
+    def put(self, key, query, response, chunk_ids):
+        pass
+
+def load_queries(path):
+    """
+    Reads one query per non-empty line, or returns the default queries when path is None.
+    """
+    if path is None:
+        return list(default_queries)
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def summarize_latencies(seconds):
+    """
+    Summarizes latencies in seconds as millisecond percentiles and a histogram.
+    """
+    if not seconds:
+        return {"count": 0}
+    ms = np.asarray(seconds) * 1000.0
+    counts = np.histogram(ms, bins=[0] + bucket_bounds_ms + [float("inf")])[0]
+    labels = [f"<={bound}ms" for bound in bucket_bounds_ms] + [f">{bucket_bounds_ms[-1]}ms"]
+    return {
+        "count": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "histogram": {label: int(count) for label, count in zip(labels, counts) if count}
+    }
+
+def print_histogram(name, summary):
+    """
+    Prints a text histogram of one phase.
+    """
+    if not summary["count"]:
+        return
+    print(f"\n{name}: p50 {summary['p50_ms']:.1f}ms  p90 {summary['p90_ms']:.1f}ms  p99 {summary['p99_ms']:.1f}ms  max {summary['max_ms']:.1f}ms")
+    widest = max(summary["histogram"].values())
+    for label, count in summary["histogram"].items():
+        print(f"  {label:>10} | {'#' * max(1, round(40 * count / widest))} {count}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the RAG query path.")
+    parser.add_argument("--queries", help="File with one query per line. Defaults to a built-in set.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of simulated concurrent users.")
+    parser.add_argument("--requests", type=int, help="Total requests, cycling through the queries. Defaults to one pass.")
+    parser.add_argument("--warmup", type=int, default=1, help="Requests run before measuring, to load the embedding model.")
+    parser.add_argument("--num-documents", type=int, default=3, help="Context chunks retrieved per query.")
+    parser.add_argument("--base-url", help="A real Ollama server to use instead of the built-in fake one.")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="Fake server generation speed.")
+    parser.add_argument("--first-token-latency", type=float, default=0.2, help="Fake server seconds before the first token.")
+    parser.add_argument("--response-tokens", type=int, default=128, help="Fake server tokens per response.")
+    parser.add_argument("--answer-cache", action="store_true", help="Leave the answer cache enabled.")
+    parser.add_argument("--verbose", action="store_true", help="Show the answers and log output rag.py prints.")
+    parser.add_argument("--output", help="Optional path to also write the report as JSON.")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    total_requests = args.requests or len(queries)
+
+    server = None
+    if args.base_url is None:
+        server = Fake_Ollama_Server(
+            tokens_per_second=args.tokens_per_second,
+            first_token_latency=args.first_token_latency,
+            response_tokens=args.response_tokens
+        ).start()
+        print(f"Fake Ollama listening on {server.base_url}")
+    base_url = args.base_url or server.base_url
+
+    # Imported here so the settings above are in place before rag builds its objects
+    import rag
+    rag.init()
+    from classes.llm import LLM
+    rag.query_llm = LLM(model_name=rag.model_name, temperature=rag.query_llm.temperature, seed=rag.query_llm.seed, base_url=base_url)
+    if not args.answer_cache:
+        rag.answer_cache = Bypassed_Answer_Cache(rag.answer_cache)
+    try:
+        rag.vector_store.cache_collections(rag.categories)
+    except Exception as e:
+        print(f"Could not open the existing collections, run rag.py to index first:\n{e}")
+        raise SystemExit(1)
+
+    results = []
+    errors = []
+    lock = threading.Lock()
+
+    def run_one(index):
+        query = queries[index % len(queries)]
+        timings = {}
+        start = time.perf_counter()
+        try:
+            rag.process_user_query(query, args.num_documents, timings=timings)
+        except Exception as e:
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}")
+            return
+        timings["total"] = time.perf_counter() - start
+        with lock:
+            results.append(timings)
+
+    # rag.py prints every answer, which would swamp the report
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    try:
+        with quiet:
+            for index in range(args.warmup):
+                rag.process_user_query(queries[index % len(queries)], args.num_documents)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                list(executor.map(run_one, range(total_requests)))
+            wall_seconds = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.stop()
+
+    report = {
+        "settings": {
+            "requests": total_requests,
+            "concurrency": args.concurrency,
+            "num_documents": args.num_documents,
+            "server": args.base_url or "fake",
+            "tokens_per_second": None if args.base_url else args.tokens_per_second,
+            "first_token_latency": None if args.base_url else args.first_token_latency,
+            "response_tokens": None if args.base_url else args.response_tokens,
+            "answer_cache": args.answer_cache
+        },
+        "wall_seconds": wall_seconds,
+        "requests_per_second": len(results) / wall_seconds if wall_seconds else None,
+        "completed": len(results),
+        "cached": sum(1 for timings in results if timings.get("cached")),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "latency": {phase: summarize_latencies([timings[phase] for timings in results]) for phase in phases},
+        "routing": rag.query_router.summary() if rag.query_router is not None else None
+    }
+
+    for phase in phases:
+        print_histogram(phase, report["latency"][phase])
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Compares the Chroma and NumPy vector store backends on synthetic collections of increasing size.
+
+For every size and backend a throwaway store is built with Vector_Store.add_documents from clustered,
+normalized random embeddings (so no embedding model runs), then single-query latency is measured with
+the collection's query method. Recall@k is measured against an exact brute-force search over the same
+vectors, which shows what Chroma's approximate HNSW index and int8 quantization give up. The report
+gives build time, chunks per second, query p50/p99, recall and on-disk size as JSON.
+
+The default sizes match the sizes the backends are compared at. 1M chunks of 384 dimensions take about
+1.5GB of float32 embeddings per backend, so the larger runs need memory and disk to spare.
+
+Usage (from the repository root):
+    python -m benchmarks.vector_store_benchmark
+    python -m benchmarks.vector_store_benchmark --sizes 10000,100000 --backends chroma,numpy,numpy-int8
+    python -m benchmarks.vector_store_benchmark --sizes 1000000 --backends numpy,numpy-int8 --output vectors.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import numpy as np
+from classes.vector_store import Vector_Store
+from classes.numpy_vector_store import Numpy_Vector_Store
+
+backends = ["chroma", "numpy", "numpy-int8"]
+
+collection_name = "Benchmark"
+
+# Rows generated per random seed, so any slice of the corpus is reproducible on its own
+SEED_BLOCK_ROWS = 1000
+
+class Synthetic_Corpus:
+    """
+    Clustered unit vectors generated in slabs, so a million rows never have to exist as Python lists.
+    """
+    def __init__(self, dimensions, clusters, seed):
+        self.dimensions = dimensions
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.centers = rng.normal(size=(clusters, dimensions)).astype(np.float32)
+
+    def _block(self, block):
+        """
+        Returns the rows of one fixed-size block, generated from its own seed.
+        """
+        rng = np.random.default_rng([self.seed, 1, block])
+        assignments = rng.integers(0, len(self.centers), size=SEED_BLOCK_ROWS)
+        vectors = self.centers[assignments] + rng.normal(scale=0.6, size=(SEED_BLOCK_ROWS, self.dimensions)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def slab(self, start, end):
+        """
+        Returns rows start to end, the same rows however the corpus is sliced.
+        """
+        first, last = start // SEED_BLOCK_ROWS, (end - 1) // SEED_BLOCK_ROWS
+        rows = np.concatenate([self._block(block) for block in range(first, last + 1)])
+        offset = first * SEED_BLOCK_ROWS
+        return rows[start - offset:end - offset]
+
+    def queries(self, count, size):
+        """
+        Returns count perturbed copies of random corpus rows.
+        """
+        rng = np.random.default_rng([self.seed, 2])
+        rows = rng.integers(0, size, size=count)
+        vectors = np.stack([self.slab(int(row), int(row) + 1)[0] for row in rows])
+        vectors += rng.normal(scale=0.3 / np.sqrt(self.dimensions), size=vectors.shape).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def exact_neighbours(corpus, size, queries, k, slab_rows):
+    """
+    Returns the ids of the k exact nearest rows to each query, scanning the corpus slab by slab.
+    """
+    best_distances = np.full((len(queries), 0), np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    for start in range(0, size, slab_rows):
+        end = min(start + slab_rows, size)
+        # Unit vectors: squared L2 is 2 - 2 * dot
+        distances = 2.0 - 2.0 * (queries @ corpus.slab(start, end).T)
+        distances = np.concatenate([best_distances, distances], axis=1)
+        rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), (len(queries), end - start))], axis=1)
+        order = np.argsort(distances, axis=1)[:, :k]
+        best_distances = np.take_along_axis(distances, order, axis=1)
+        best_rows = np.take_along_axis(rows, order, axis=1)
+    return [{f"chunk-{row}" for row in rows} for rows in best_rows]
+
+def directory_bytes(path):
+    """
+    Returns the total size of the files under path.
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def open_store(backend, path):
+    """
+    Opens an empty store of the given backend with no embedding cache.
+    """
+    if backend == "chroma":
+        return Vector_Store(path)
+    return Numpy_Vector_Store(path, quantize=backend == "numpy-int8")
+
+def run_backend(backend, corpus, size, queries, truth, k, slab_rows):
+    """
+    Builds one store of the given size and measures its build time, query latency and recall.
+    """
+    path = tempfile.mkdtemp(prefix=f"vector_store_benchmark_{backend}_")
+    try:
+        vector_store = open_store(backend, path)
+        vector_store.create_collection(collection_name)
+
+        start = time.perf_counter()
+        for slab_start in range(0, size, slab_rows):
+            slab_end = min(slab_start + slab_rows, size)
+            ids = [f"chunk-{row}" for row in range(slab_start, slab_end)]
+            vector_store.add_documents(
+                collection_name,
+                [f"Synthetic chunk {row}" for row in range(slab_start, slab_end)],
+                [{"source": "synthetic.pdf", "page_number": row // 20, "classification": "Requirements"} for row in range(slab_start, slab_end)],
+                ids,
+                embeddings=list(corpus.slab(slab_start, slab_end))
+            )
+        build_seconds = time.perf_counter() - start
+
+        collection = vector_store.get_collection(collection_name)
+        # One untimed query loads the index
+        collection.query(query_embeddings=[queries[0].tolist()], n_results=k)
+        latencies = []
+        found = 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k)
+            latencies.append(time.perf_counter() - start)
+            found += len(expected.intersection(result["ids"][0]))
+        latencies_ms = np.asarray(latencies) * 1000.0
+
+        return {
+            "build_seconds": build_seconds,
+            "chunks_per_second": size / build_seconds if build_seconds else None,
+            "query_p50_ms": float(np.percentile(latencies_ms, 50)),
+            "query_p99_ms": float(np.percentile(latencies_ms, 99)),
+            "query_mean_ms": float(latencies_ms.mean()),
+            f"recall_at_{k}": found / (k * len(queries)),
+            "disk_mb": directory_bytes(path) / 1e6
+        }
+    finally:
+        vector_store = collection = None
+        shutil.rmtree(path, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Chroma and NumPy vector store backends.")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated collection sizes.")
+    parser.add_argument("--backends", default=",".join(backends), help=f"Comma-separated backends from {backends}.")
+    parser.add_argument("--dimensions", type=int, default=384, help="Embedding dimensions, 384 matches the default embedding model.")
+    parser.add_argument("--clusters", type=int, default=256, help="Clusters the synthetic embeddings are drawn around.")
+    parser.add_argument("--queries", type=int, default=200, help="Queries timed per store.")
+    parser.add_argument("-k", type=int, default=5, help="Results per query.")
+    parser.add_argument("--slab-rows", type=int, default=50000, help="Rows generated and added per add_documents call.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Optional path to also write the report as JSON.")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    selected = [backend for backend in args.backends.split(",") if backend]
+    unknown = [backend for backend in selected if backend not in backends]
+    if unknown:
+        parser.error(f"Unknown backends {unknown}, choose from {backends}")
+
+    corpus = Synthetic_Corpus(args.dimensions, args.clusters, args.seed)
+    report = {
+        "settings": {
+            "dimensions": args.dimensions,
+            "clusters": args.clusters,
+            "queries": args.queries,
+            "k": args.k,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": {}
+    }
+    for size in sizes:
+        queries = corpus.queries(args.queries, size)
+        truth = exact_neighbours(corpus, size, queries, args.k, args.slab_rows)
+        report["results"][str(size)] = {}
+        for backend in selected:
+            print(f"\nBenchmarking {backend} at {size} chunks...")
+            result = run_backend(backend, corpus, size, queries, truth, args.k, args.slab_rows)
+            report["results"][str(size)][backend] = result
+            print(f"{backend} @ {size}: build {result['build_seconds']:.1f}s, query p50 {result['query_p50_ms']:.2f}ms "
+                  f"p99 {result['query_p99_ms']:.2f}ms, recall@{args.k} {result[f'recall_at_{args.k}']:.3f}")
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+class Answer_Cache:
+    def __init__(self, cache_path, ttl_seconds=7 * 24 * 60 * 60, max_entries=5000):
+        """
+        Initializes a persistent on-disk cache of LLM answers.
+
+        Entries are keyed by the normalized query, the sorted IDs of the retrieved context, the model
+        name and the generation parameters, so an answer is only reused when the exact same question
+        is asked against the exact same evidence. Each entry also records its contributing chunk IDs,
+        letting invalidate_chunks drop every answer built on a chunk that is re-indexed or deleted.
+
+        Args:
+            cache_path (str): The sqlite file the cache is stored in.
+            ttl_seconds (float): How long an answer stays valid after it was generated.
+            max_entries (int): The maximum number of answers kept, least recently used are evicted first.
+        """
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS answer_chunks (
+                key TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                PRIMARY KEY (key, chunk_id)
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_answer_chunks_chunk_id ON answer_chunks (chunk_id)")
+        self.connection.commit()
+        print("Answer Cache initialized")
+
+    @staticmethod
+    def normalize_query(query):
+        """
+        Normalizes a query so trivial differences in case, spacing and trailing punctuation share an entry.
+
+        Args:
+            query (str): The raw user query.
+
+        Returns:
+            str: The normalized query.
+        """
+        query = re.sub(r"\s+", " ", query.strip().lower())
+        return query.rstrip("?!. ")
+
+    @classmethod
+    def make_key(cls, query, chunk_ids, model_name, parameters):
+        """
+        Builds the cache key for a query answered from a given set of retrieved chunks.
+
+        Args:
+            query (str): The raw user query.
+            chunk_ids (list): The IDs of the retrieved context chunks, in any order.
+            model_name (str): The LLM model name.
+            parameters (dict): Generation and prompt parameters that influence the answer.
+
+        Returns:
+            str: A SHA-256 hex digest.
+        """
+        payload = json.dumps([cls.normalize_query(query), sorted(chunk_ids), model_name, parameters], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Returns a cached answer, dropping it instead if it has expired.
+
+        Args:
+            key (str): The key from make_key.
+
+        Returns:
+            str: The cached response, or None on a miss.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute("SELECT response, created FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            response, created = row
+            if now - created > self.ttl_seconds:
+                self._delete_keys([key])
+                self.connection.commit()
+                return None
+            self.connection.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+        return response
+
+    def put(self, key, query, response, chunk_ids):
+        """
+        Stores an answer with the chunk IDs it was generated from and evicts entries past the size cap.
+
+        Args:
+            key (str): The key from make_key.
+            query (str): The raw user query, kept for inspection.
+            response (str): The cleaned LLM response.
+            chunk_ids (list): The IDs of the retrieved context chunks.
+        """
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO answers (key, query, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, query, response, now, now)
+            )
+            self.connection.execute("DELETE FROM answer_chunks WHERE key = ?", (key,))
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO answer_chunks (key, chunk_id) VALUES (?, ?)",
+                [(key, chunk_id) for chunk_id in chunk_ids]
+            )
+            self._evict(now)
+            self.connection.commit()
+
+    def invalidate_chunks(self, chunk_ids):
+        """
+        Drops every answer that was generated from any of the given chunks.
+
+        Args:
+            chunk_ids (list): IDs of chunks that were re-indexed or deleted. None drops every answer.
+        """
+        with self.lock:
+            if chunk_ids is None:
+                self.connection.execute("DELETE FROM answer_chunks")
+                self.connection.execute("DELETE FROM answers")
+                self.connection.commit()
+                return
+            chunk_ids = list(chunk_ids)
+            keys = set()
+            # Stay well under sqlite's bound-parameter limit
+            for i in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                keys.update(row[0] for row in self.connection.execute(
+                    f"SELECT DISTINCT key FROM answer_chunks WHERE chunk_id IN ({placeholders})", batch
+                ))
+            if keys:
+                self._delete_keys(list(keys))
+                self.connection.commit()
+                print(f"Invalidated {len(keys)} cached answers")
+
+    def _delete_keys(self, keys):
+        """
+        Deletes answers and their chunk links. Caller must hold the lock.
+        """
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            self.connection.execute(f"DELETE FROM answer_chunks WHERE key IN ({placeholders})", batch)
+            self.connection.execute(f"DELETE FROM answers WHERE key IN ({placeholders})", batch)
+
+    def _evict(self, now):
+        """
+        Deletes expired answers, then the least recently used ones beyond max_entries. Caller must hold the lock.
+        """
+        expired = [row[0] for row in self.connection.execute(
+            "SELECT key FROM answers WHERE created < ?", (now - self.ttl_seconds,)
+        )]
+        if expired:
+            self._delete_keys(expired)
+        count = self.connection.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            oldest = [row[0] for row in self.connection.execute(
+                "SELECT key FROM answers ORDER BY last_used ASC LIMIT ?", (overflow,)
+            )]
+            self._delete_keys(oldest)
+
+    def close(self):
+        """
+        Closes the underlying sqlite connection.
+        """
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class Classification_Cache:
+    def __init__(self, cache_path, max_entries=500000):
+        """
+        Initializes a persistent on-disk cache of zero-shot classification results.
+
+        Entries are keyed by the chunk hash plus a context key built from the model name,
+        category list and hypothesis template, so changing any of those never returns a stale label.
+        The least recently used entries are evicted once the cache grows past max_entries.
+
+        Args:
+            cache_path (str): The sqlite file the cache is stored in.
+            max_entries (int): The maximum number of cached classifications kept on disk.
+        """
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS classifications (
+                chunk_hash TEXT NOT NULL,
+                context TEXT NOT NULL,
+                label TEXT NOT NULL,
+                score REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (chunk_hash, context)
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_classifications_last_used ON classifications (last_used)")
+        self.connection.commit()
+        print("Classification Cache initialized")
+
+    @staticmethod
+    def context_key(model_name, categories, hypothesis_template):
+        """
+        Builds the part of the cache key shared by every chunk classified with the same settings.
+
+        Args:
+            model_name (str): The classification model name.
+            categories (list): The candidate labels, in order.
+            hypothesis_template (str): The NLI hypothesis template.
+
+        Returns:
+            str: A SHA-256 hex digest identifying the classifier configuration.
+        """
+        payload = json.dumps([model_name, list(categories), hypothesis_template])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get_many(self, chunk_hashes, context):
+        """
+        Looks up cached classifications and refreshes their last-used time.
+
+        Args:
+            chunk_hashes (list): The chunk hashes to look up.
+            context (str): The context key from context_key.
+
+        Returns:
+            dict: Maps each cached chunk hash to its (label, score) tuple. Misses are absent.
+        """
+        found = {}
+        unique_hashes = list(dict.fromkeys(chunk_hashes))
+        with self.lock:
+            # Stay well under sqlite's bound-parameter limit
+            for i in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.connection.execute(
+                    f"SELECT chunk_hash, label, score FROM classifications WHERE context = ? AND chunk_hash IN ({placeholders})",
+                    [context, *batch]
+                ).fetchall()
+                for chunk_hash, label, score in rows:
+                    found[chunk_hash] = (label, score)
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    "UPDATE classifications SET last_used = ? WHERE chunk_hash = ? AND context = ?",
+                    [(now, chunk_hash, context) for chunk_hash in found]
+                )
+                self.connection.commit()
+        return found
+
+    def put_many(self, entries, context):
+        """
+        Stores classification results and evicts the least recently used entries past the size cap.
+
+        Args:
+            entries (dict): Maps chunk hash to its (label, score) tuple.
+            context (str): The context key from context_key.
+        """
+        if not entries:
+            return
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO classifications (chunk_hash, context, label, score, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(chunk_hash, context, label, float(score), now) for chunk_hash, (label, score) in entries.items()]
+            )
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self):
+        """
+        Deletes the least recently used rows beyond max_entries. Caller must hold the lock.
+        """
+        count = self.connection.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.connection.execute(
+                "DELETE FROM classifications WHERE rowid IN (SELECT rowid FROM classifications ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def clear(self):
+        """
+        Removes every cached classification.
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM classifications")
+            self.connection.commit()
+
+    def close(self):
+        """
+        Closes the underlying sqlite connection.
+        """
+        with self.lock:
+            self.connection.close()
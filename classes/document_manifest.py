@@ -0,0 +1,116 @@
+import json
+import os
+
+class Document_Manifest:
+    def __init__(self, manifest_path):
+        """
+        Initializes the document manifest stored next to the vector store.
+
+        The manifest records, per source document, the content hash of the file that was indexed,
+        the chunk IDs it produced and the settings used to produce them (classifier and embedding
+        model versions, chunking parameters). It lets startup skip unchanged documents and remove
+        only the stale chunks of changed ones instead of rebuilding the whole store.
+
+        Args:
+            manifest_path (str): The JSON file the manifest is saved to.
+        """
+        self.manifest_path = manifest_path
+        self.documents = {}
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    self.documents = json.load(f).get("documents", {})
+            except Exception as e:
+                print(f"Error reading document manifest, starting from an empty one:\n{e}")
+        print("Document Manifest initialized")
+
+    def get(self, source):
+        """
+        Returns the manifest entry for a source document, or None if it has never been indexed.
+
+        Args:
+            source (str): The source identifier for the document (e.g., filename).
+
+        Returns:
+            dict: The entry with content_hash, chunk_ids and settings keys.
+        """
+        return self.documents.get(source)
+
+    def is_current(self, source, content_hash, settings):
+        """
+        Checks whether a document was already indexed from the same file contents and settings.
+
+        Args:
+            source (str): The source identifier for the document.
+            content_hash (str): The SHA-256 hash of the file contents.
+            settings (dict): The classifier, embedding and chunking settings in use.
+
+        Returns:
+            bool: True when the document can be skipped.
+        """
+        entry = self.documents.get(source)
+        return entry is not None and entry["content_hash"] == content_hash and entry["settings"] == settings
+
+    def record(self, source, content_hash, chunk_ids, settings):
+        """
+        Records the chunks produced for a document and saves the manifest.
+
+        Args:
+            source (str): The source identifier for the document.
+            content_hash (str): The SHA-256 hash of the file contents.
+            chunk_ids (list): The IDs of every chunk the document produced.
+            settings (dict): The classifier, embedding and chunking settings in use.
+        """
+        self.documents[source] = {
+            "content_hash": content_hash,
+            "chunk_ids": list(chunk_ids),
+            "settings": settings
+        }
+        self.save()
+
+    def remove(self, source):
+        """
+        Removes a document from the manifest and saves it.
+
+        Args:
+            source (str): The source identifier for the document.
+        """
+        self.documents.pop(source, None)
+        self.save()
+
+    def referenced_ids(self, exclude_source=None):
+        """
+        Collects the chunk IDs referenced by every document except exclude_source.
+        Chunks are content-addressed, so boilerplate shared between documents must not be deleted
+        when only one of them changes.
+
+        Args:
+            exclude_source (str, optional): The document to leave out.
+
+        Returns:
+            set: The referenced chunk IDs.
+        """
+        ids = set()
+        for source, entry in self.documents.items():
+            if source != exclude_source:
+                ids.update(entry["chunk_ids"])
+        return ids
+
+    def clear(self):
+        """
+        Forgets every document, used when the vector store is rebuilt from scratch.
+        """
+        self.documents = {}
+        self.save()
+
+    def save(self):
+        """
+        Writes the manifest atomically so an interrupted run never leaves a truncated file.
+        """
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"documents": self.documents}, f)
+        os.replace(temp_path, self.manifest_path)
@@ -0,0 +1,185 @@
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+
+class Embedding_Cache:
+    def __init__(self, cache_dir, model_id, initial_capacity=1024):
+        """
+        Initializes a persistent cache of document embeddings for one embedding model.
+
+        Vectors are stored as float32 rows in a single memory-mapped file per model and located
+        through a sqlite index keyed by (chunk SHA-256, model ID), so rebuilding or re-creating
+        collections costs a lookup instead of running the embedding model again. Several processes
+        may share a cache directory: each write allocates its rows inside a sqlite write transaction,
+        so two writers never place vectors at the same offsets.
+
+        Args:
+            cache_dir (str): The directory holding the vector file and its index.
+            model_id (str): Identifies the embedding model, vectors from other models are never returned.
+            initial_capacity (int): The number of rows reserved when the vector file is first created.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.model_id = model_id
+        self.initial_capacity = initial_capacity
+        safe_model_id = re.sub(r"[^A-Za-z0-9_.-]", "_", model_id)
+        self.vectors_path = os.path.join(cache_dir, f"{safe_model_id}.f32")
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(os.path.join(cache_dir, "embedding_index.sqlite3"), check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                chunk_hash TEXT NOT NULL,
+                model_id TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                PRIMARY KEY (chunk_hash, model_id)
+            )""")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS models (
+                model_id TEXT PRIMARY KEY,
+                dimensions INTEGER NOT NULL,
+                rows INTEGER NOT NULL
+            )""")
+        self.connection.commit()
+
+        row = self.connection.execute("SELECT dimensions, rows FROM models WHERE model_id = ?", (model_id,)).fetchone()
+        self.dimensions, self.rows = row if row else (None, 0)
+        self.vectors = None
+        if self.dimensions is not None and os.path.exists(self.vectors_path):
+            self._open_vectors()
+        print(f"Embedding Cache initialized with {self.rows} cached embeddings for {model_id}")
+
+    def _open_vectors(self):
+        """
+        Memory-maps the vector file at its current size.
+        """
+        capacity = os.path.getsize(self.vectors_path) // (self.dimensions * 4)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dimensions))
+
+    def _ensure_capacity(self, rows_needed):
+        """
+        Grows the vector file, doubling its capacity, until it can hold rows_needed rows.
+        """
+        capacity = 0 if self.vectors is None else self.vectors.shape[0]
+        if rows_needed <= capacity:
+            return
+        # Another process may already have grown the file, only remap then, and never shrink it
+        disk_capacity = os.path.getsize(self.vectors_path) // (self.dimensions * 4) if os.path.exists(self.vectors_path) else 0
+        if rows_needed <= disk_capacity:
+            self.vectors = None
+            self._open_vectors()
+            return
+        new_capacity = max(rows_needed, disk_capacity * 2, self.initial_capacity)
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dimensions * 4)
+        self._open_vectors()
+
+    def get_many(self, chunk_hashes):
+        """
+        Looks up cached embeddings.
+
+        Args:
+            chunk_hashes (list): SHA-256 hashes of the document texts.
+
+        Returns:
+            dict: Maps each cached hash to a float32 vector. Misses are absent.
+        """
+        found = {}
+        if self.vectors is None:
+            return found
+        unique_hashes = list(dict.fromkeys(chunk_hashes))
+        with self.lock:
+            # Stay well under sqlite's bound-parameter limit
+            for i in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                for chunk_hash, row in self.connection.execute(
+                    f"SELECT chunk_hash, row FROM embeddings WHERE model_id = ? AND chunk_hash IN ({placeholders})",
+                    [self.model_id, *batch]
+                ).fetchall():
+                    if row >= self.vectors.shape[0]:
+                        # Written by another process after the file grew past this map
+                        self._open_vectors()
+                    # Copy out of the memory map so callers never hold a view into the file
+                    found[chunk_hash] = np.array(self.vectors[row])
+        return found
+
+    def put_many(self, chunk_hashes, embeddings):
+        """
+        Appends embeddings for hashes that are not cached yet.
+
+        Args:
+            chunk_hashes (list): SHA-256 hashes of the document texts.
+            embeddings (list): One vector per hash.
+        """
+        if not chunk_hashes:
+            return
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        with self.lock:
+            # Take the write lock before allocating rows, so a process sharing the cache cannot
+            # claim the same rows between reading the row count and recording the new rows
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._put_many_locked(chunk_hashes, matrix)
+                self.connection.commit()
+            except BaseException:
+                self.connection.rollback()
+                raise
+
+    def _put_many_locked(self, chunk_hashes, matrix):
+        """
+        Appends the new embeddings, the caller holds the lock and an open write transaction.
+        """
+        # Other processes may have appended since this cache last looked
+        row = self.connection.execute("SELECT dimensions, rows FROM models WHERE model_id = ?", (self.model_id,)).fetchone()
+        if row:
+            self.dimensions, self.rows = row
+        if self.dimensions is None:
+            self.dimensions = matrix.shape[1]
+        elif matrix.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional embeddings for {self.model_id}, got {matrix.shape[1]}")
+
+        # Skip hashes already stored, including duplicates within this call
+        existing = set()
+        for i in range(0, len(chunk_hashes), 500):
+            batch = chunk_hashes[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            existing.update(row[0] for row in self.connection.execute(
+                f"SELECT chunk_hash FROM embeddings WHERE model_id = ? AND chunk_hash IN ({placeholders})",
+                [self.model_id, *batch]
+            ))
+        new_rows = []
+        for index, chunk_hash in enumerate(chunk_hashes):
+            if chunk_hash not in existing:
+                existing.add(chunk_hash)
+                new_rows.append((chunk_hash, index))
+        if not new_rows:
+            return
+
+        start = self.rows
+        self._ensure_capacity(start + len(new_rows))
+        self.vectors[start:start + len(new_rows)] = matrix[[index for _, index in new_rows]]
+        # Vectors reach the file before the index points at them
+        self.vectors.flush()
+        self.connection.executemany(
+            "INSERT INTO embeddings (chunk_hash, model_id, row) VALUES (?, ?, ?)",
+            [(chunk_hash, self.model_id, start + offset) for offset, (chunk_hash, _) in enumerate(new_rows)]
+        )
+        self.rows = start + len(new_rows)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO models (model_id, dimensions, rows) VALUES (?, ?, ?)",
+            (self.model_id, self.dimensions, self.rows)
+        )
+
+    def close(self):
+        """
+        Flushes the vector file and closes the index.
+        """
+        with self.lock:
+            if self.vectors is not None:
+                self.vectors.flush()
+                self.vectors = None
+            self.connection.close()
@@ -0,0 +1,240 @@
+import queue
+import threading
+from collections import defaultdict
+from classes.metrics import metrics
+
+# Sentinel placed on a stage queue once its producer is exhausted
+_END = object()
+
+class _Stage_Error:
+    """Carries an exception raised inside a background stage over to the consuming thread."""
+    def __init__(self, error):
+        self.error = error
+
+class Ingest_Pipeline:
+    def __init__(self, util, vector_store, classifier, summarizer=None, batch_size=32, queue_size=2, chunker=None):
+        """
+        Initializes a streaming ingestion pipeline: pages -> chunks -> dedup -> (summarize) -> classify -> grouped upserts.
+
+        Every stage works on fixed-size micro-batches and runs in its own thread, connected to the next
+        stage by a bounded queue, so memory stays proportional to a few batches rather than to the whole
+        document and chunks become searchable while later pages are still being processed.
+
+        Args:
+            util (Util): Utility used for chunking and hashing.
+            vector_store (Vector_Store): The vector store the chunks are added to.
+            classifier (Zero_Shot_Classifier): The classifier used to pick each chunk's collection.
+            summarizer (Summarizer, optional): The summarizer used when summarize=True.
+            batch_size (int): The number of chunks in each micro-batch.
+            queue_size (int): The maximum number of batches buffered between two stages.
+            chunker (callable, optional): Takes (page_text, chunk_size) and returns the page's chunks.
+                                          Defaults to Util.chunk_intelligent with chunk_size in characters.
+        """
+        self.util = util
+        self.vector_store = vector_store
+        self.classifier = classifier
+        self.summarizer = summarizer
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.chunker = chunker if chunker else (lambda text, chunk_size: util.chunk_intelligent(text, max_chunk_size=chunk_size))
+
+    def _background(self, iterable):
+        """
+        Runs an iterable in a background thread, handing its items over through a bounded queue.
+
+        Args:
+            iterable (iterable): The upstream stage.
+
+        Yields:
+            The items produced by the upstream stage, in order.
+        """
+        buffer = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        def put(item):
+            # Block while the queue is full, but give up once the consumer has gone away
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for item in iterable:
+                    if not put(item):
+                        return
+            except BaseException as e:
+                put(_Stage_Error(e))
+            put(_END)
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is _END:
+                    break
+                if isinstance(item, _Stage_Error):
+                    raise item.error
+                yield item
+        finally:
+            stop.set()
+
+    def _chunk_stage(self, parsed_pages_data, chunk_size):
+        """
+        Chunks pages lazily and yields micro-batches of {raw_chunk, page_number, id} dicts.
+        """
+        batch = []
+        for page_number, page_content in parsed_pages_data:
+            if not page_content or not page_content.strip(): # Only process pages that have actual content
+                continue
+            with metrics.span("chunk", page_number=page_number) as span:
+                chunks = self.chunker(page_content, chunk_size)
+                span.set(chunks=len(chunks))
+            metrics.increment("chunks_created", len(chunks))
+            for chunk_text in chunks:
+                batch.append({
+                    "raw_chunk": chunk_text,
+                    "page_number": page_number,
+                    "id": self.util.generate_hash(chunk_text) # Hash of the raw chunk
+                })
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def _dedup_stage(self, batches, stats):
+        """
+        Drops chunks that already exist in the vector store or were already seen earlier in this document.
+        """
+        seen_ids = set()
+        for batch in batches:
+            stats["chunks"] += len(batch)
+            # Keep the first occurrence of each ID, including repeats within this batch
+            unseen_items = []
+            for item in batch:
+                # Every page lists each chunk it contains, so the page index also finds text repeated on later pages
+                page_ids = stats["pages"][item["page_number"]]
+                if item["id"] not in page_ids:
+                    page_ids.append(item["id"])
+                if item["id"] not in seen_ids:
+                    seen_ids.add(item["id"])
+                    unseen_items.append(item)
+                    stats["chunk_ids"].append(item["id"])
+            existing_ids = set()
+            if unseen_items:
+                with metrics.span("dedup", chunks=len(batch)):
+                    existing_ids = set(self.vector_store.query_collections_by_ids([item["id"] for item in unseen_items]))
+            new_items = [item for item in unseen_items if item["id"] not in existing_ids]
+            # Repeats within this document and chunks already in the store are counted apart
+            metrics.increment("chunks_skipped_duplicate", len(batch) - len(unseen_items))
+            metrics.increment("chunks_skipped_existing", len(unseen_items) - len(new_items))
+            if new_items:
+                yield new_items
+
+    def _summarize_stage(self, batches):
+        """
+        Replaces each chunk's document text with its summary, keeping the raw chunk hash as the ID.
+        """
+        for batch in batches:
+            summaries = self.summarizer.bulk_summarize(texts=[item["raw_chunk"] for item in batch])
+            for item, summary in zip(batch, summaries):
+                item["document"] = summary
+            yield batch
+
+    def _classify_stage(self, batches):
+        """
+        Classifies each micro-batch and attaches the (label, score) result to every item.
+        """
+        for batch in batches:
+            # Reuse the raw chunk hash when the document is the raw chunk, otherwise hash the summary
+            chunk_hashes = [item.get("document_hash") or self.util.generate_hash(item["document"]) for item in batch]
+            documents = [item["document"] for item in batch]
+
+            embeddings = None
+            if getattr(self.classifier, "mode", "nli") == "embedding":
+                # The vector store needs these embeddings anyway, so compute them once (through its cache) and share them
+                embeddings = self.vector_store.embed_documents(documents)
+                for item, embedding in zip(batch, embeddings):
+                    item["embedding"] = embedding
+
+            classifications = self.classifier.classify_bulk(documents, chunk_hashes=chunk_hashes, embeddings=embeddings)
+            for item, classification_result in zip(batch, classifications):
+                item["classification"] = classification_result
+            yield batch
+
+    def _upsert_batch(self, batch, source, stats):
+        """
+        Groups a classified micro-batch by label and adds each group to its collection.
+        """
+        sorted_by_classification = defaultdict(list)
+        for item in batch:
+            label, score = item["classification"]
+            sorted_by_classification[label].append({
+                "document": item["document"],
+                "metadata": {
+                    "source": source,
+                    "classification": label, # The predicted category name
+                    "confidence": score,     # The confidence score
+                    "page_number": item["page_number"] # Page number from the document
+                },
+                "id": item["id"],
+                "embedding": item.get("embedding")
+            })
+
+        for classification_key, arr in sorted_by_classification.items():
+            embeddings = [data["embedding"] for data in arr]
+            self.vector_store.add_documents(
+                classification_key,
+                [data["document"] for data in arr],
+                [data["metadata"] for data in arr],
+                [data["id"] for data in arr],
+                embeddings=embeddings if all(embedding is not None for embedding in embeddings) else None
+            )
+            stats["added"][classification_key] += len(arr)
+
+    def run(self, parsed_pages_data, source="", summarize=False, chunk_size=300):
+        """
+        Streams parsed pages through every stage and into the vector store.
+
+        Args:
+            parsed_pages_data (iterable[tuple[int, str]]): (page_number, page_text) pairs, may be a lazy generator.
+            source (str): The source identifier for the document (e.g., filename).
+            summarize (bool): Whether to summarize chunks before adding them.
+            chunk_size (int): The size of chunks for text splitting.
+
+        Returns:
+            dict: Counts of chunks seen ("chunks") and chunks added per collection ("added"),
+                  plus the unique IDs of every chunk the document produced ("chunk_ids") and
+                  the IDs of the chunks on each page, repeats included, by page number ("pages").
+        """
+        stats = {"chunks": 0, "chunk_ids": [], "added": defaultdict(int), "pages": defaultdict(list)}
+
+        batches = self._background(self._chunk_stage(parsed_pages_data, chunk_size))
+        batches = self._background(self._dedup_stage(batches, stats))
+        if summarize:
+            batches = self._background(self._summarize_stage(batches))
+        else:
+            batches = self._with_raw_documents(batches)
+        batches = self._background(self._classify_stage(batches))
+
+        for batch in batches:
+            self._upsert_batch(batch, source, stats)
+            print(f"Added batch of {len(batch)} chunks from {source} ({sum(stats['added'].values())} new so far)")
+
+        return stats
+
+    @staticmethod
+    def _with_raw_documents(batches):
+        """
+        Uses the raw chunk text as the stored document when summarization is skipped.
+        """
+        for batch in batches:
+            for item in batch:
+                item["document"] = item["raw_chunk"]
+                item["document_hash"] = item["id"]
+            yield batch
@@ -0,0 +1,225 @@
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+# Runs of letters and digits, kept together across -, ., /, _ and : so identifiers such as
+# 32701-25-297, 3.2.1 or 12/31/2025 survive as one term
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+(?:[-./_:][0-9a-z]+)*")
+
+STOP_WORDS = frozenset((
+    "a an and are as at be but by for from has have in is it its of on or that the their this to was were will with "
+    "what which who when where how does do shall must should can may".split()
+))
+
+class Lexical_Index:
+    def __init__(self, index_path, k1=1.2, b=0.75):
+        """
+        Initializes a persistent BM25 inverted index over chunk text.
+
+        Terms and chunks are interned as integers and postings are stored as (term, chunk, term frequency)
+        rows clustered by term, so scoring a query reads only the postings of its own terms rather than
+        scanning the corpus. Chunks are keyed by the same IDs as the vector store and remember which
+        collection they were written to.
+
+        Args:
+            index_path (str): The sqlite file the index is stored in.
+            k1 (float): BM25 term frequency saturation.
+            b (float): BM25 document length normalization.
+        """
+        directory = os.path.dirname(index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(index_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS terms (
+                term_id INTEGER PRIMARY KEY,
+                term TEXT NOT NULL UNIQUE
+            )""")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_row INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                collection TEXT NOT NULL,
+                length INTEGER NOT NULL
+            )""")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                term_id INTEGER NOT NULL,
+                chunk_row INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term_id, chunk_row)
+            ) WITHOUT ROWID""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk_row ON postings (chunk_row)")
+        self.connection.commit()
+        self.chunk_count, self.total_length = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks").fetchone()
+        print("Lexical Index initialized")
+
+    @staticmethod
+    def tokenize(text):
+        """
+        Splits text into lowercase index terms. Compound identifiers are kept whole and also split into
+        their parts, so "RFI 32701-25-261" matches both the full number and "32701".
+
+        Args:
+            text (str): The text to tokenize.
+
+        Returns:
+            list: The terms, stop words removed.
+        """
+        terms = []
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            if token in STOP_WORDS:
+                continue
+            terms.append(token)
+            if not token.isalnum():
+                terms.extend(part for part in re.split(r"[-./_:]", token) if part not in STOP_WORDS)
+        return terms
+
+    @staticmethod
+    def identifiers(text):
+        """
+        Returns the identifier-like terms of a text (RFP numbers, section numbers, dates): tokens that
+        contain a digit and are either joined by separators or mix letters and digits.
+        """
+        return [
+            token for token in TOKEN_PATTERN.findall(text.lower())
+            if any(character.isdigit() for character in token) and (not token.isalnum() or not token.isdigit())
+        ]
+
+    def _remove_locked(self, ids):
+        """
+        Removes chunks and their postings, the caller holds the lock and commits.
+        """
+        for chunk_id in ids:
+            row = self.connection.execute("SELECT chunk_row, length FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            if row is None:
+                continue
+            chunk_row, length = row
+            self.connection.execute("DELETE FROM postings WHERE chunk_row = ?", (chunk_row,))
+            self.connection.execute("DELETE FROM chunks WHERE chunk_row = ?", (chunk_row,))
+            self.chunk_count -= 1
+            self.total_length -= length
+
+    def add(self, collection_name, ids, documents):
+        """
+        Indexes chunks, replacing any already indexed under the same IDs.
+
+        Args:
+            collection_name (str): The collection the chunks were written to.
+            ids (list): The chunk IDs.
+            documents (list): The chunk texts.
+        """
+        with self.lock:
+            self._remove_locked(ids)
+            for chunk_id, document in zip(ids, documents):
+                counts = Counter(self.tokenize(document or ""))
+                length = sum(counts.values())
+                chunk_row = self.connection.execute(
+                    "INSERT INTO chunks (chunk_id, collection, length) VALUES (?, ?, ?)",
+                    (chunk_id, collection_name, length)
+                ).lastrowid
+                self.connection.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", ((term,) for term in counts))
+                term_ids = self._term_ids(list(counts))
+                self.connection.executemany(
+                    "INSERT INTO postings (term_id, chunk_row, tf) VALUES (?, ?, ?)",
+                    ((term_ids[term], chunk_row, tf) for term, tf in counts.items())
+                )
+                self.chunk_count += 1
+                self.total_length += length
+            self.connection.commit()
+
+    def _term_ids(self, terms):
+        """
+        Maps terms to their IDs, leaving out terms that were never indexed.
+        """
+        term_ids = {}
+        # Stay well under sqlite's limit on bound parameters
+        for start in range(0, len(terms), 500):
+            batch = terms[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            term_ids.update(self.connection.execute(f"SELECT term, term_id FROM terms WHERE term IN ({placeholders})", batch).fetchall())
+        return term_ids
+
+    def remove(self, ids):
+        """
+        Removes chunks from the index, IDs that were never indexed are ignored.
+        """
+        with self.lock:
+            self._remove_locked(ids)
+            self.connection.commit()
+
+    def remove_collection(self, collection_name):
+        """
+        Removes every chunk written to a collection.
+        """
+        with self.lock:
+            ids = [row[0] for row in self.connection.execute("SELECT chunk_id FROM chunks WHERE collection = ?", (collection_name,))]
+            self._remove_locked(ids)
+            self.connection.commit()
+
+    def search(self, query_text, k=10, collections=None, ids=None):
+        """
+        Ranks chunks against a query with BM25.
+
+        Args:
+            query_text (str): The query.
+            k (int): The number of chunks to return.
+            collections (list, optional): Only return chunks from these collections.
+            ids (list, optional): Only return these chunks.
+
+        Returns:
+            list: Up to k {"id", "collection", "score"} dicts, best first.
+        """
+        query_terms = set(self.tokenize(query_text))
+        with self.lock:
+            if not query_terms or not self.chunk_count:
+                return []
+            average_length = self.total_length / self.chunk_count
+            scores = {}
+            for term, term_id in self._term_ids(list(query_terms)).items():
+                postings = self.connection.execute(
+                    "SELECT p.chunk_row, p.tf, c.length FROM postings p JOIN chunks c ON c.chunk_row = p.chunk_row WHERE p.term_id = ?",
+                    (term_id,)
+                ).fetchall()
+                idf = math.log(1.0 + (self.chunk_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_row, tf, length in postings:
+                    norm = self.k1 * (1.0 - self.b + self.b * length / average_length)
+                    scores[chunk_row] = scores.get(chunk_row, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+            if not scores:
+                return []
+
+            allowed = set(collections) if collections is not None else None
+            allowed_ids = set(ids) if ids is not None else None
+            results = []
+            # Walk the ranking until k chunks passing the filters are found
+            if allowed is None and allowed_ids is None:
+                ranked = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            else:
+                ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            for chunk_row, score in ranked:
+                chunk_id, collection = self.connection.execute(
+                    "SELECT chunk_id, collection FROM chunks WHERE chunk_row = ?", (chunk_row,)
+                ).fetchone()
+                if allowed is not None and collection not in allowed:
+                    continue
+                if allowed_ids is not None and chunk_id not in allowed_ids:
+                    continue
+                results.append({"id": chunk_id, "collection": collection, "score": score})
+                if len(results) >= k:
+                    break
+            return results
+
+    def close(self):
+        """
+        Closes the index.
+        """
+        with self.lock:
+            self.connection.close()
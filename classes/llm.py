@@ -1,47 +1,155 @@
+import time
 from langchain_ollama import OllamaLLM
-import torch
+from classes.metrics import metrics
 
 class LLM:
-    def __init__(self, model_name="qwen3:8b", temperature=0.3, device="cuda:0", seed=99999):
+    def __init__(self, model_name="qwen3:8b", temperature=0.3, device="cuda:0", seed=99999, base_url=None):
             """
-            Initializes the LLM class with a specified model and temperature,
-            defaulting to 'cpu' if a CUDA-enabled GPU is not available.
+            Initializes the LLM class with a specified model and temperature.
+
+            The Ollama server decides whether the model runs on GPU or CPU, so no local
+            device probing (and no torch import) is needed to create the client.
 
             Args:
                 model_name (str): The name of the LLM model to use.
                 temperature (float): The temperature setting for the model.
-                device (str): The preferred device (default is "cuda:0").
+                device (str): Kept for compatibility, device placement is handled by the Ollama server.
                 seed (int): The seed for reproducibility.
+                base_url (str, optional): The Ollama server URL. Defaults to the OLLAMA_HOST environment
+                                          variable, or the local server.
             """
-            
-            # 1. Check for GPU availability using PyTorch
-            if torch.cuda.is_available():
-                # Use the specified device (defaulting to 'cuda:0')
-                actual_device = device
-                print(f"✅ GPU available. Initializing {model_name} on {actual_device} with temperature={temperature}")
-            else:
-                # Fallback to CPU
-                actual_device = -1
-                print(f"⚠️ No GPU detected or available. Initializing {model_name} on {actual_device} with temperature={temperature}")
-
-            # 2. Initialize the model with the determined device
-            # Note: OllamaLLM is assumed to correctly handle the 'cpu' device string.
-            self.model = OllamaLLM(model=model_name, device=actual_device, temperature=temperature, seed=seed)
+            print(f"Initializing {model_name} through Ollama with temperature={temperature}")
+            self.model_name = model_name
+            self.temperature = temperature
+            self.seed = seed
+            self.base_url = base_url
+            self.model = OllamaLLM(model=model_name, temperature=temperature, seed=seed, base_url=base_url)
             self.messages = []
 
     def set_messages(self, messages):
         """Sets the conversation history."""
         self.messages = messages
 
-    def prompt(self, text):
+    def _with_prompt(self, text, messages):
+        """
+        Appends the prompt to the given history, or to the stored conversation history when none is given.
+        """
+        if messages is None:
+            self.messages = self.messages + [("user", text)]
+            return self.messages
+        # An explicit history is never written back, so concurrent callers do not share state
+        return list(messages) + [("user", text)]
+
+    def prompt(self, text, messages=None):
         """
         Sends a prompt to the model and returns the response.
 
         Args:
             text (str): The input text for the model.
+            messages (list, optional): The history to send the prompt with, e.g. [] for a stateless call.
+                                       Defaults to the stored conversation history, which is then extended.
 
         Returns:
             str: The response from the model.
         """
-        self.messages = self.messages + [("user", text)]
-        return self.model.invoke(self.messages)
+        with metrics.span("llm_generate", model=self.model_name, prompt_chars=len(text)):
+            return self.model.invoke(self._with_prompt(text, messages))
+
+    def stream(self, text, messages=None):
+        """
+        Sends a prompt to the model and yields the response as it is generated.
+
+        Args:
+            text (str): The input text for the model.
+            messages (list, optional): The history to send the prompt with, see prompt.
+
+        Yields:
+            str: Chunks of the response, in order, as the model produces them.
+        """
+        start = time.perf_counter()
+        first_chunk = True
+        with metrics.span("llm_generate", model=self.model_name, prompt_chars=len(text), streamed=True):
+            for chunk in self.model.stream(self._with_prompt(text, messages)):
+                if first_chunk:
+                    metrics.observe("llm_first_token", time.perf_counter() - start, model=self.model_name)
+                    first_chunk = False
+                yield chunk
+
+class Think_Filter:
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self):
+        """
+        Incrementally removes <think>...</think> spans from streamed model output.
+
+        Text that could be the start of a tag split across chunks is held back until the next
+        chunk shows whether it is one. An unterminated think block is dropped entirely.
+        """
+        self.buffer = ""
+        self.in_think = False
+
+    def _partial_tag_length(self, tag):
+        """
+        Returns the length of the longest suffix of the buffer that is a proper prefix of tag.
+        """
+        for length in range(min(len(tag) - 1, len(self.buffer)), 0, -1):
+            if self.buffer.endswith(tag[:length]):
+                return length
+        return 0
+
+    def feed(self, chunk):
+        """
+        Adds a streamed chunk and returns the text that is now known to be visible.
+
+        Args:
+            chunk (str): The next piece of model output.
+
+        Returns:
+            str: Visible text, possibly empty.
+        """
+        self.buffer += chunk
+        visible = []
+        while True:
+            tag = self.CLOSE_TAG if self.in_think else self.OPEN_TAG
+            index = self.buffer.find(tag)
+            if index != -1:
+                if not self.in_think:
+                    visible.append(self.buffer[:index])
+                self.buffer = self.buffer[index + len(tag):]
+                self.in_think = not self.in_think
+                continue
+
+            # Hold back a possible partial tag, everything before it is settled
+            keep = self._partial_tag_length(tag)
+            settled = len(self.buffer) - keep
+            if not self.in_think:
+                visible.append(self.buffer[:settled])
+            self.buffer = self.buffer[settled:]
+            return "".join(visible)
+
+    @classmethod
+    def remove(cls, text):
+        """
+        Removes the think spans from a complete response, treating an unterminated think block
+        exactly as the streaming path does.
+
+        Args:
+            text (str): The full model output.
+
+        Returns:
+            str: The visible text.
+        """
+        think_filter = cls()
+        return think_filter.feed(text) + think_filter.flush()
+
+    def flush(self):
+        """
+        Returns any held-back visible text once the stream has ended.
+
+        Returns:
+            str: The remaining visible text, empty if the stream ended inside a think block.
+        """
+        remaining = "" if self.in_think else self.buffer
+        self.buffer = ""
+        return remaining
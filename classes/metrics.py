@@ -0,0 +1,271 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds, in seconds, of the stage duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class _Null_Span:
+    """
+    The span handed out while metrics are disabled, every method is a no-op.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **fields):
+        pass
+
+_NULL_SPAN = _Null_Span()
+
+class _Span:
+    """
+    Times one run of a stage and records it on exit.
+    """
+    def __init__(self, metrics, stage, fields):
+        self.metrics = metrics
+        self.stage = stage
+        self.fields = fields
+
+    def set(self, **fields):
+        """
+        Attaches extra fields (such as item counts) to the span's JSON log line.
+        """
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        self.metrics.observe(self.stage, time.perf_counter() - self.start, **self.fields)
+        return False
+
+class Metrics:
+    def __init__(self, enabled=False, json_log_path=None, prefix="rag"):
+        """
+        Initializes a registry of stage timings and counters.
+
+        While disabled, span returns a shared no-op context manager and increment returns at once, so
+        instrumented code pays a single attribute check. Once enabled, every span is recorded in a
+        per-stage duration histogram, optionally appended to a JSON lines log, and everything can be
+        read back as a dict, as Prometheus text or from a small HTTP endpoint.
+
+        Args:
+            enabled (bool): Whether to record anything.
+            json_log_path (str, optional): A file every finished span is appended to as one JSON object per line.
+            prefix (str): Prepended to every Prometheus metric name.
+        """
+        self.enabled = enabled
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.json_log = None
+        self.durations = {}
+        self.counters = {}
+        self.server = None
+        if json_log_path:
+            self.json_log = open(json_log_path, "a", encoding="utf-8")
+
+    def enable(self, json_log_path=None):
+        """
+        Starts recording, optionally logging every span to a JSON lines file.
+        """
+        with self.lock:
+            if json_log_path and self.json_log is None:
+                self.json_log = open(json_log_path, "a", encoding="utf-8")
+            self.enabled = True
+
+    def disable(self):
+        """
+        Stops recording. Values recorded so far are kept.
+        """
+        self.enabled = False
+
+    def reset(self):
+        """
+        Discards every recorded value.
+        """
+        with self.lock:
+            self.durations = {}
+            self.counters = {}
+
+    def span(self, stage, **fields):
+        """
+        Returns a context manager that times one run of a stage.
+
+        Args:
+            stage (str): The stage name, e.g. "parse" or "chroma_query".
+            **fields: Extra values written to the JSON log line, not used as Prometheus labels.
+
+        Returns:
+            A context manager whose set(**fields) attaches more values before it exits.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, fields)
+
+    def timed_iter(self, stage, iterable, **fields):
+        """
+        Yields from iterable, timing only the time spent producing items (not the caller's work between
+        them) and recording it as one span when the iterable is exhausted or closed.
+        """
+        if not self.enabled:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        elapsed = 0.0
+        items = 0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    elapsed += time.perf_counter() - start
+                    break
+                elapsed += time.perf_counter() - start
+                items += 1
+                yield item
+        finally:
+            self.observe(stage, elapsed, items=items, **fields)
+
+    def observe(self, stage, seconds, **fields):
+        """
+        Records a duration for a stage.
+
+        Args:
+            stage (str): The stage name.
+            seconds (float): How long the stage took.
+            **fields: Extra values written to the JSON log line.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.durations.get(stage)
+            if histogram is None:
+                histogram = self.durations[stage] = {"count": 0, "sum": 0.0, "buckets": [0] * len(DURATION_BUCKETS)}
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+                    break
+            if self.json_log is not None:
+                self.json_log.write(json.dumps({"ts": time.time(), "stage": stage, "seconds": seconds, **fields}, default=str) + "\n")
+                self.json_log.flush()
+
+    def increment(self, name, value=1):
+        """
+        Adds to a counter, e.g. increment("pages_parsed", 12).
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        """
+        Returns the recorded values.
+
+        Returns:
+            dict: "stages" maps each stage to its count, total and mean seconds, "counters" maps each counter to its value.
+        """
+        with self.lock:
+            return {
+                "stages": {
+                    stage: {
+                        "count": histogram["count"],
+                        "seconds": histogram["sum"],
+                        "mean_seconds": histogram["sum"] / histogram["count"] if histogram["count"] else 0.0
+                    }
+                    for stage, histogram in self.durations.items()
+                },
+                "counters": dict(self.counters)
+            }
+
+    def prometheus_text(self):
+        """
+        Renders the recorded values in the Prometheus text exposition format.
+
+        Returns:
+            str: A stage duration histogram labelled by stage, and one counter per counter name.
+        """
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent in each pipeline stage.", f"# TYPE {name} histogram"]
+        with self.lock:
+            for stage, histogram in sorted(self.durations.items()):
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram["sum"]}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram["count"]}')
+            for counter, value in sorted(self.counters.items()):
+                counter_name = f"{self.prefix}_{counter}_total"
+                lines.append(f"# TYPE {counter_name} counter")
+                lines.append(f"{counter_name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Writes prometheus_text to a file, e.g. for the node exporter's textfile collector.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Serves prometheus_text at /metrics and snapshot as JSON at /metrics.json on a background thread.
+
+        Args:
+            port (int): The port to listen on.
+            host (str): The interface to listen on.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = metrics.prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(metrics.snapshot()).encode("utf-8"), "application/json"
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Metrics available at http://{host}:{self.server.server_address[1]}/metrics")
+
+    def close(self):
+        """
+        Stops the HTTP endpoint and closes the JSON log.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        with self.lock:
+            if self.json_log is not None:
+                self.json_log.close()
+                self.json_log = None
+
+# Shared by every instrumented class, disabled until rag.py enables it
+metrics = Metrics()
@@ -0,0 +1,549 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from classes.vector_store import Vector_Store
+
+# Rows scored per block, bounds the temporary memory of a query over a large collection
+SCAN_BLOCK_ROWS = 65536
+
+class Numpy_Collection:
+    def __init__(self, name, path, embedding_function, quantize=False, rescore_factor=4, metadata=None, initial_capacity=1024):
+        """
+        Initializes an exact-search collection stored as a contiguous embedding matrix.
+
+        Embeddings live in a memory-mapped float32 file and every query is answered by one blocked
+        matrix-vector product, which at tens of thousands of chunks is both exact and faster than an
+        approximate graph index. With quantize, an int8 copy of every row (with a per-row scale) is
+        kept in memory and scanned instead, and only the best rescore_factor * k candidates are
+        rescored against the float32 rows, so the float matrix can stay mostly on disk.
+
+        Documents and metadata are held in columnar lists and persisted to an append-only JSON lines
+        log. Deleted rows are tombstoned and reclaimed by compact.
+
+        Implements the subset of the Chroma collection API that Vector_Store relies on
+        (upsert, add, get, delete, query and count), with distances in squared L2 like Chroma's default.
+
+        Args:
+            name (str): The collection name.
+            path (str): The directory holding the collection's files.
+            embedding_function (callable): Embeds texts passed without precomputed embeddings.
+            quantize (bool): Whether to scan an int8 copy of the embeddings.
+            rescore_factor (int): Candidates rescored in float32 per requested result when quantized.
+            metadata (dict, optional): Collection metadata, stored on creation.
+            initial_capacity (int): Rows reserved when the embedding file is first created.
+        """
+        self.name = name
+        self.path = path
+        self.embedding_function = embedding_function
+        self.rescore_factor = rescore_factor
+        self.initial_capacity = initial_capacity
+        self.lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+
+        info_path = os.path.join(path, "collection.json")
+        if os.path.exists(info_path):
+            with open(info_path, "r", encoding="utf-8") as f:
+                info = json.load(f)
+        else:
+            info = {"dimensions": None, "quantize": quantize, "metadata": metadata or {}}
+            with open(info_path, "w", encoding="utf-8") as f:
+                json.dump(info, f)
+        self.info_path = info_path
+        self.metadata = info["metadata"]
+        self.dimensions = info["dimensions"]
+        # The quantization setting is fixed when the collection is created
+        self.quantize = info["quantize"]
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.log_path = os.path.join(path, "rows.jsonl")
+
+        self.rows = 0
+        self.capacity = 0
+        self.vectors = None
+        self.ids = []
+        self.documents = []
+        self.columns = {}
+        self.column_arrays = {}
+        self.id_to_row = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.squared_norms = np.zeros(0, dtype=np.float32)
+        self.quantized = None
+        self.scales = None
+        self._load()
+
+    def _load(self):
+        """
+        Rebuilds the columns, tombstones and quantized copy from the log and the embedding file.
+        """
+        if self.dimensions is None or not os.path.exists(self.vectors_path):
+            return
+        self._open_vectors()
+        dead_rows = []
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A write interrupted mid-line, everything before it is intact
+                        break
+                    if "delete" in entry:
+                        dead_rows.extend(entry["delete"])
+                    else:
+                        self._append_columns(entry["id"], entry["document"], entry["metadata"])
+        self._grow_arrays(self.rows)
+        self.alive[:self.rows] = True
+        for row in dead_rows:
+            self.alive[row] = False
+        for row in range(self.rows):
+            if self.alive[row]:
+                self.id_to_row[self.ids[row]] = row
+        matrix = np.asarray(self.vectors[:self.rows])
+        self.squared_norms[:self.rows] = np.einsum("ij,ij->i", matrix, matrix)
+        if self.quantize:
+            self.quantized[:self.rows], self.scales[:self.rows] = self._quantize(matrix)
+
+    def _open_vectors(self):
+        """
+        Memory-maps the embedding file at its current size.
+        """
+        self.capacity = os.path.getsize(self.vectors_path) // (self.dimensions * 4)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dimensions))
+
+    def _grow_arrays(self, rows_needed):
+        """
+        Grows the embedding file and the in-memory row arrays, doubling, until they hold rows_needed rows.
+        """
+        if rows_needed > self.capacity:
+            new_capacity = max(rows_needed, self.capacity * 2, self.initial_capacity)
+            if self.vectors is not None:
+                self.vectors.flush()
+                self.vectors = None
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(new_capacity * self.dimensions * 4)
+            self._open_vectors()
+        if len(self.alive) < self.capacity:
+            self.alive = np.concatenate([self.alive, np.zeros(self.capacity - len(self.alive), dtype=bool)])
+            self.squared_norms = np.concatenate([self.squared_norms, np.zeros(self.capacity - len(self.squared_norms), dtype=np.float32)])
+            if self.quantize:
+                quantized = np.zeros((self.capacity, self.dimensions), dtype=np.int8)
+                scales = np.zeros(self.capacity, dtype=np.float32)
+                if self.quantized is not None:
+                    quantized[:len(self.quantized)] = self.quantized
+                    scales[:len(self.scales)] = self.scales
+                self.quantized, self.scales = quantized, scales
+
+    @staticmethod
+    def _quantize(matrix):
+        """
+        Quantizes rows to int8 with a symmetric per-row scale.
+
+        Returns:
+            tuple: (int8 matrix, float32 scales) such that matrix ~= int8 * scale[:, None].
+        """
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def _append_columns(self, chunk_id, document, metadata):
+        """
+        Appends one row to the id, document and metadata columns.
+        """
+        metadata = metadata or {}
+        for key in metadata:
+            if key not in self.columns:
+                self.columns[key] = [None] * self.rows
+        for key, column in self.columns.items():
+            column.append(metadata.get(key))
+        self.ids.append(chunk_id)
+        self.documents.append(document)
+        self.rows += 1
+
+    def _row_metadata(self, row):
+        """
+        Rebuilds one row's metadata dict from the columns.
+        """
+        return {key: column[row] for key, column in self.columns.items() if column[row] is not None}
+
+    def count(self):
+        """
+        Returns the number of live rows.
+        """
+        return len(self.id_to_row)
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None):
+        """
+        Adds rows, replacing any existing rows with the same ids.
+        """
+        self.upsert(ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None):
+        """
+        Writes rows, tombstoning any existing rows with the same ids.
+
+        Args:
+            ids (list): One unique ID per row.
+            embeddings (list, optional): Precomputed embeddings, documents are embedded if omitted.
+            metadatas (list, optional): One metadata dict per row.
+            documents (list, optional): The document text of each row.
+        """
+        if not ids:
+            return
+        if embeddings is None:
+            embeddings = self.embedding_function(documents)
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        metadatas = metadatas or [None] * len(ids)
+        documents = documents or [None] * len(ids)
+
+        with self.lock:
+            if self.dimensions is None:
+                self.dimensions = matrix.shape[1]
+                with open(self.info_path, "w", encoding="utf-8") as f:
+                    json.dump({"dimensions": self.dimensions, "quantize": self.quantize, "metadata": self.metadata}, f)
+            elif matrix.shape[1] != self.dimensions:
+                raise ValueError(f"Expected {self.dimensions}-dimensional embeddings in {self.name}, got {matrix.shape[1]}")
+
+            replaced = [self.id_to_row.pop(chunk_id) for chunk_id in ids if chunk_id in self.id_to_row]
+            start = self.rows
+            end = start + len(ids)
+            self._grow_arrays(end)
+            self.vectors[start:end] = matrix
+            # Embeddings reach the file before the log refers to them
+            self.vectors.flush()
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                if replaced:
+                    f.write(json.dumps({"delete": replaced}) + "\n")
+                for chunk_id, document, metadata in zip(ids, documents, metadatas):
+                    f.write(json.dumps({"id": chunk_id, "document": document, "metadata": metadata}) + "\n")
+
+            for chunk_id, document, metadata in zip(ids, documents, metadatas):
+                self._append_columns(chunk_id, document, metadata)
+            self.alive[replaced] = False
+            self.alive[start:end] = True
+            self.squared_norms[start:end] = np.einsum("ij,ij->i", matrix, matrix)
+            if self.quantize:
+                self.quantized[start:end], self.scales[start:end] = self._quantize(matrix)
+            # Later duplicates within the same call win, as with Chroma's upsert
+            for offset, chunk_id in enumerate(ids):
+                previous = self.id_to_row.get(chunk_id)
+                if previous is not None:
+                    self.alive[previous] = False
+                self.id_to_row[chunk_id] = start + offset
+
+    def get(self, ids=None, include=("documents", "metadatas"), limit=None, where=None):
+        """
+        Returns live rows by id, or every live row when ids is None, optionally filtered by a where clause.
+
+        Returns:
+            dict: "ids" plus whichever of "documents", "metadatas" and "embeddings" were included.
+        """
+        with self.lock:
+            if ids is None:
+                rows = [row for row in range(self.rows) if self.alive[row]]
+            else:
+                rows = [self.id_to_row[chunk_id] for chunk_id in ids if chunk_id in self.id_to_row]
+            if where:
+                mask = self._where_mask(where)
+                rows = [row for row in rows if mask[row]]
+            if limit is not None:
+                rows = rows[:limit]
+            result = {"ids": [self.ids[row] for row in rows]}
+            if "documents" in include:
+                result["documents"] = [self.documents[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self._row_metadata(row) for row in rows]
+            if "embeddings" in include:
+                result["embeddings"] = [np.array(self.vectors[row]) for row in rows]
+        return result
+
+    def delete(self, ids):
+        """
+        Tombstones the rows with the given ids, compacting once most rows are dead.
+        """
+        with self.lock:
+            rows = [self.id_to_row.pop(chunk_id) for chunk_id in ids if chunk_id in self.id_to_row]
+            if not rows:
+                return
+            self.alive[rows] = False
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"delete": rows}) + "\n")
+            dead = self.rows - len(self.id_to_row)
+            if dead > 1024 and dead > len(self.id_to_row):
+                self.compact()
+
+    def compact(self):
+        """
+        Rewrites the collection without its tombstoned rows.
+        """
+        with self.lock:
+            live_rows = [row for row in range(self.rows) if self.alive[row]]
+            matrix = np.array(self.vectors[live_rows]) if live_rows else np.zeros((0, self.dimensions), dtype=np.float32)
+            entries = [(self.ids[row], self.documents[row], self._row_metadata(row)) for row in live_rows]
+
+            # Write the new files beside the old ones and swap them in together
+            vectors_tmp = self.vectors_path + ".tmp"
+            log_tmp = self.log_path + ".tmp"
+            capacity = max(len(live_rows), self.initial_capacity)
+            compacted = np.memmap(vectors_tmp, dtype=np.float32, mode="w+", shape=(capacity, self.dimensions))
+            compacted[:len(live_rows)] = matrix
+            compacted.flush()
+            del compacted
+            with open(log_tmp, "w", encoding="utf-8") as f:
+                for chunk_id, document, metadata in entries:
+                    f.write(json.dumps({"id": chunk_id, "document": document, "metadata": metadata}) + "\n")
+            self.vectors = None
+            os.replace(vectors_tmp, self.vectors_path)
+            os.replace(log_tmp, self.log_path)
+
+            self.rows = 0
+            self.capacity = 0
+            self.ids, self.documents, self.columns, self.id_to_row = [], [], {}, {}
+            self.column_arrays = {}
+            self.alive = np.zeros(0, dtype=bool)
+            self.squared_norms = np.zeros(0, dtype=np.float32)
+            self.quantized = self.scales = None
+            self._load()
+
+    def _column_array(self, key, numeric):
+        """
+        Returns one metadata column as an array, float with NaN for missing values when numeric.
+        Arrays are cached until rows are appended.
+        """
+        cached = self.column_arrays.get((key, numeric))
+        if cached is not None and len(cached) == self.rows:
+            return cached
+        column = self.columns.get(key, [None] * self.rows)
+        if numeric:
+            array = np.array([value if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan for value in column], dtype=np.float64)
+        else:
+            array = np.empty(self.rows, dtype=object)
+            array[:] = column
+        self.column_arrays[(key, numeric)] = array
+        return array
+
+    def _where_mask(self, where):
+        """
+        Evaluates a Chroma-style where clause over the metadata columns as a boolean row mask.
+        Supports $and, $or and the $eq, $ne, $gt, $gte, $lt, $lte, $in and $nin operators.
+        """
+        mask = np.ones(self.rows, dtype=bool)
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                masks = [self._where_mask(clause) for clause in condition]
+                combined = np.logical_and.reduce(masks) if key == "$and" else np.logical_or.reduce(masks)
+                mask &= combined
+                continue
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, value in condition.items():
+                if operator in ("$gt", "$gte", "$lt", "$lte"):
+                    column = self._column_array(key, numeric=True)
+                    with np.errstate(invalid="ignore"):
+                        if operator == "$gt":
+                            mask &= column > value
+                        elif operator == "$gte":
+                            mask &= column >= value
+                        elif operator == "$lt":
+                            mask &= column < value
+                        else:
+                            mask &= column <= value
+                elif operator in ("$eq", "$ne", "$in", "$nin"):
+                    column = self._column_array(key, numeric=False)
+                    matches = np.zeros(self.rows, dtype=bool)
+                    for candidate in (value if operator in ("$in", "$nin") else [value]):
+                        matches |= column == candidate
+                    mask &= matches if operator in ("$eq", "$in") else ~matches
+                else:
+                    raise ValueError(f"Unsupported where operator '{operator}'")
+        return mask
+
+    def _distances(self, query, rows_end, rows=None):
+        """
+        Squared L2 distance from the query to every row below rows_end, or only to the given rows.
+        Dead rows and rows left out are set to infinity.
+        """
+        query_norm = float(query @ query)
+        if rows is not None:
+            # A selective filter scores only the rows it kept
+            distances = np.full(rows_end, np.inf, dtype=np.float32)
+            for start in range(0, len(rows), SCAN_BLOCK_ROWS):
+                block = rows[start:start + SCAN_BLOCK_ROWS]
+                if self.quantize:
+                    dots = (self.quantized[block] @ query) * self.scales[block]
+                else:
+                    dots = self.vectors[block] @ query
+                distances[block] = self.squared_norms[block] - 2.0 * dots + query_norm
+            return distances
+        distances = np.empty(rows_end, dtype=np.float32)
+        for start in range(0, rows_end, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, rows_end)
+            if self.quantize:
+                dots = (self.quantized[start:end] @ query) * self.scales[start:end]
+            else:
+                dots = self.vectors[start:end] @ query
+            distances[start:end] = self.squared_norms[start:end] - 2.0 * dots + query_norm
+        distances[~self.alive[:rows_end]] = np.inf
+        return distances
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None, include=("documents", "metadatas", "distances")):
+        """
+        Returns the n_results nearest live rows to each query, in the shape Chroma's query returns.
+        A where clause is evaluated as a row mask first, so filtered-out rows are never scored.
+        """
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(query_texts)
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query in query_embeddings:
+            query = np.asarray(query, dtype=np.float32)
+            with self.lock:
+                rows_end = self.rows
+                rows = None
+                available = len(self.id_to_row)
+                if where:
+                    rows = np.flatnonzero(self._where_mask(where) & self.alive[:rows_end])
+                    available = len(rows)
+                k = min(n_results, available)
+                if k == 0:
+                    for key in result:
+                        result[key].append([])
+                    continue
+                distances = self._distances(query, rows_end, rows)
+                candidates = k * self.rescore_factor if self.quantize else k
+                if candidates < rows_end:
+                    top = np.argpartition(distances, candidates - 1)[:candidates]
+                else:
+                    top = np.arange(rows_end)
+                top = np.sort(top[np.isfinite(distances[top])])
+                if self.quantize:
+                    # Rescore the quantized candidates against the exact float32 rows
+                    difference = np.asarray(self.vectors[top]) - query
+                    distances = np.full(rows_end, np.inf, dtype=np.float32)
+                    distances[top] = np.einsum("ij,ij->i", difference, difference)
+                top = top[np.argsort(distances[top], kind="stable")][:k]
+                result["ids"].append([self.ids[row] for row in top])
+                result["documents"].append([self.documents[row] for row in top])
+                result["metadatas"].append([self._row_metadata(row) for row in top])
+                result["distances"].append([float(distances[row]) for row in top])
+        return result
+
+    def close(self):
+        """
+        Flushes the embedding file.
+        """
+        with self.lock:
+            if self.vectors is not None:
+                self.vectors.flush()
+
+class Numpy_Vector_Store(Vector_Store):
+    def __init__(self, storage_path, quantize=False, rescore_factor=4, query_workers=4, embedding_cache_path=None,
+                 embedding_batch_size=64, upsert_batch_size=4096, embedding_workers=1, lexical_index_path=None):
+        """
+        Initializes a vector store backed by exact NumPy search instead of Chroma.
+
+        Exposes the same methods as Vector_Store, each collection being a Numpy_Collection stored in
+        its own directory under storage_path.
+
+        Args:
+            storage_path (string): The directory collections are saved in.
+            quantize (bool): Whether new collections scan int8-quantized embeddings, rescoring the best in float32.
+            rescore_factor (int): Candidates rescored per requested result when quantized.
+            query_workers (int): Number of threads used to search the cached collections concurrently.
+            embedding_cache_path (string, optional): Directory of a persistent embedding cache.
+            embedding_batch_size (int): Number of uncached documents embedded per call to the embedding function.
+            upsert_batch_size (int): Number of documents written per upsert.
+            embedding_workers (int): Batches embedded ahead of the one being written.
+            lexical_index_path (string, optional): A sqlite file for a BM25 index kept in step with every write.
+        """
+        self.storage_path = storage_path
+        self.quantize = quantize
+        self.rescore_factor = rescore_factor
+        os.makedirs(storage_path, exist_ok=True)
+        self._setup(query_workers, embedding_cache_path, embedding_batch_size, upsert_batch_size, embedding_workers, lexical_index_path)
+        print(f"NumPy Vector Store initialized{' with int8 quantization' if quantize else ''}")
+
+    def heartbeat(self):
+        """
+        Matches Chroma's heartbeat, there is no server to check.
+        """
+        return time.time_ns()
+
+    def _collection_path(self, collection_name):
+        """
+        Returns the directory of a collection, rejecting names that are not safe directory names.
+        """
+        if not re.fullmatch(r"[A-Za-z0-9_.-]+", collection_name):
+            raise ValueError(f"Invalid collection name '{collection_name}'")
+        return os.path.join(self.storage_path, collection_name)
+
+    def _open_collection(self, collection_name, metadata=None, cache=True):
+        """
+        Opens a collection, creating it when metadata is given, and caches it unless cache is False.
+        """
+        path = self._collection_path(collection_name)
+        if metadata is None and not os.path.exists(os.path.join(path, "collection.json")):
+            raise ValueError(f"Collection {collection_name} does not exist.")
+        collection = Numpy_Collection(collection_name, path, self.embedding_function, quantize=self.quantize,
+                                      rescore_factor=self.rescore_factor, metadata=metadata)
+        if cache:
+            self.cached_collections[collection_name] = collection
+        return collection
+
+    def open_collection(self, collection_name):
+        """
+        Opens a collection, creating it if needed, without caching it.
+        """
+        return self._open_collection(collection_name, metadata={"created": str(datetime.now())}, cache=False)
+
+    def cache_collections(self, collection_list):
+        """
+        Opens and caches each existing collection from collection_list.
+        """
+        for collection_name in collection_list:
+            self.get_collection(collection_name)
+
+    def create_collection(self, collection_name):
+        """
+        Creates a new collection or opens an existing one.
+        """
+        cached_collection = self.cached_collections.get(collection_name)
+        if cached_collection is not None:
+            return cached_collection
+        return self._open_collection(collection_name, metadata={
+            "description": f"This is the collection containing documents about {collection_name}",
+            "created": str(datetime.now())
+        })
+
+    def get_collection(self, collection_name):
+        """
+        Retrieves an existing collection by name, from the cache when possible.
+        """
+        cached_collection = self.cached_collections.get(collection_name)
+        if cached_collection is not None:
+            return cached_collection
+        return self._open_collection(collection_name)
+
+    def delete_collection(self, collection_name):
+        """
+        Deletes a collection and its files.
+        """
+        collection = self.cached_collections.pop(collection_name, None)
+        if collection is not None:
+            collection.close()
+            collection.vectors = None
+        try:
+            shutil.rmtree(self._collection_path(collection_name))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error occured while deleting collection files:\n{e}")
+        if self.lexical_index is not None:
+            self.lexical_index.remove_collection(collection_name)
+        self._notify_changed(None)
+        print(f"Deleted Collection: {collection_name}")
@@ -0,0 +1,106 @@
+import numpy as np
+from classes.util import Util
+from classes.metrics import metrics
+
+class Page_Index:
+    def __init__(self, vector_store, collection_name="Page_Index"):
+        """
+        Initializes a coarse index holding one summary vector per indexed page.
+
+        Each page is represented by the normalized mean of its chunk embeddings, stored in a collection
+        of the same backend as the chunks but kept out of the vector store's cached collections, so
+        query_all_collections never searches it. Every page also records the IDs of its chunks. A query
+        first finds its nearest pages here and the chunk search is then restricted to those pages' chunk
+        IDs, so the fine search only ranks chunks from a fixed number of pages however many documents are
+        indexed. Chunks shared with a document indexed earlier keep that document's source metadata, so
+        the pages are matched by chunk ID rather than by source and page number.
+
+        Args:
+            vector_store (Vector_Store): The vector store holding the chunks, any backend.
+            collection_name (str): The name of the page collection.
+        """
+        self.vector_store = vector_store
+        self.collection_name = collection_name
+        self.collection = vector_store.open_collection(collection_name)
+        print("Page Index initialized")
+
+    @staticmethod
+    def page_id(source, page_number):
+        """
+        Returns the ID of a page's summary vector.
+        """
+        return Util.generate_hash(f"{source}\x00{page_number}")
+
+    def remove_source(self, source):
+        """
+        Removes every page of a source document.
+        """
+        ids = self.collection.get(where={"source": {"$eq": source}}, include=[])["ids"]
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def update(self, source, pages):
+        """
+        Replaces the page vectors of a source document, built from the chunk embeddings already stored.
+
+        Args:
+            source (str): The source document name.
+            pages (dict): Maps each page_number to the IDs of the chunks the page produced.
+        """
+        with metrics.span("page_index", source=source, pages=len(pages)):
+            self.remove_source(source)
+            chunk_ids = list({chunk_id for ids in pages.values() for chunk_id in ids})
+            embeddings = {}
+            for collection_name, collection in self.vector_store.cached_collections.items():
+                for start in range(0, len(chunk_ids), self.vector_store.upsert_batch_size):
+                    found = collection.get(ids=chunk_ids[start:start + self.vector_store.upsert_batch_size], include=["embeddings"])
+                    embeddings.update(zip(found["ids"], found["embeddings"]))
+
+            ids, vectors, metadatas = [], [], []
+            for page_number, page_chunk_ids in sorted(pages.items()):
+                found_ids = [chunk_id for chunk_id in dict.fromkeys(page_chunk_ids) if chunk_id in embeddings]
+                if not found_ids:
+                    continue
+                page_vectors = [embeddings[chunk_id] for chunk_id in found_ids]
+                matrix = np.asarray(page_vectors, dtype=np.float32)
+                matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+                mean = matrix.mean(axis=0)
+                mean /= max(float(np.linalg.norm(mean)), 1e-12)
+                ids.append(self.page_id(source, page_number))
+                vectors.append(mean.tolist())
+                # Metadata values must be scalars, so the chunk IDs are stored joined
+                metadatas.append({"source": source, "page_number": page_number, "chunks": len(page_vectors), "chunk_ids": ",".join(found_ids)})
+            for start in range(0, len(ids), self.vector_store.upsert_batch_size):
+                end = start + self.vector_store.upsert_batch_size
+                self.collection.upsert(ids=ids[start:end], embeddings=vectors[start:end], metadatas=metadatas[start:end])
+        print(f"Indexed {len(ids)} pages of {source} in the page index")
+
+    def clear(self):
+        """
+        Removes every page.
+        """
+        ids = self.collection.get(include=[])["ids"]
+        for start in range(0, len(ids), self.vector_store.upsert_batch_size):
+            self.collection.delete(ids=ids[start:start + self.vector_store.upsert_batch_size])
+
+    def restrict(self, query_embedding, num_pages):
+        """
+        Finds the pages nearest to a query and returns the IDs of their chunks, to limit a chunk search to.
+
+        Args:
+            query_embedding (list): The embedded query.
+            num_pages (int): The number of pages kept. More pages raise recall, fewer make the fine search cheaper.
+
+        Returns:
+            list: The chunk IDs, or None when the index holds no more than num_pages pages and
+                  restricting would only add work.
+        """
+        if self.collection.count() <= num_pages:
+            return None
+        with metrics.span("page_search", pages=num_pages):
+            result = self.collection.query(query_embeddings=[query_embedding], n_results=num_pages, include=["metadatas"])
+        chunk_ids = {}
+        for metadata in result["metadatas"][0]:
+            chunk_ids.update(dict.fromkeys(metadata.get("chunk_ids", "").split(",")))
+        chunk_ids.pop("", None)
+        return list(chunk_ids) if chunk_ids else None
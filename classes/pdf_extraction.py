@@ -0,0 +1,118 @@
+"""
+Page extraction helpers run by PDF_Parser, both in process and inside its worker processes.
+
+Kept apart from the rest of the application so a spawned worker only imports pdfplumber and pypdfium2.
+"""
+import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+# "pdfium" extracts text natively and only routes difficult pages to pdfplumber,
+# "pdfplumber" runs the full character-level layout analysis on every page
+BACKENDS = ("pdfium", "pdfplumber")
+
+def _page_count(pdf_location):
+    """
+    Counts the pages of a PDF without running any layout analysis.
+    """
+    pdf = pdfium.PdfDocument(pdf_location)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+def _pdfium_page_text(page):
+    """
+    Extracts a page's text with pdfium, normalising its line endings to match pdfplumber.
+    """
+    textpage = page.get_textpage()
+    try:
+        text = textpage.get_text_range()
+    finally:
+        textpage.close()
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+def _needs_layout_analysis(page, text, table_path_threshold, short_line_ratio, min_clean_ratio):
+    """
+    Decides whether a page extracted by pdfium should be re-extracted by pdfplumber.
+
+    Pages are flagged as table-heavy when they draw many vector paths (cell borders and rules)
+    or when most of their lines are short cell fragments, and as low quality when the text
+    contains too many replacement or control characters.
+    """
+    stripped = text.strip()
+    if stripped:
+        clean = sum(1 for char in stripped if char.isprintable() or char.isspace())
+        if clean / len(stripped) < min_clean_ratio or stripped.count("\ufffd") / len(stripped) > 1 - min_clean_ratio:
+            return True
+
+        lines = [line for line in stripped.split("\n") if line.strip()]
+        if len(lines) >= 10 and sum(1 for line in lines if len(line.strip()) < 40) / len(lines) >= short_line_ratio:
+            return True
+
+    # Stop counting as soon as the threshold is reached
+    path_count = 0
+    for _ in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_PATH], max_depth=2):
+        path_count += 1
+        if path_count >= table_path_threshold:
+            return True
+    return False
+
+def _iter_page_range(pdf_location, start=0, end=None, backend="pdfium", table_path_threshold=100, short_line_ratio=0.6, min_clean_ratio=0.95):
+    """
+    Lazily extracts (page_number, page_text) pairs for pages [start, end) of a PDF.
+
+    With the pdfium backend each page is extracted natively and only pages flagged by
+    _needs_layout_analysis are sent through pdfplumber. Each pdfplumber page's cached layout
+    objects are released as soon as its text has been extracted, so memory stays proportional
+    to a single page rather than to the whole document.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == "pdfplumber":
+        with pdfplumber.open(pdf_location) as pdf:
+            pages = pdf.pages
+            end = len(pages) if end is None else min(end, len(pages))
+            for i in range(start, end):
+                yield i + 1, _pdfplumber_page_text(pages[i]) # Page numbers are 1-indexed
+        return
+
+    pdf = pdfium.PdfDocument(pdf_location)
+    # Only opened if a page needs the slower layout analysis
+    plumber_pdf = None
+    try:
+        end = len(pdf) if end is None else min(end, len(pdf))
+        for i in range(start, end):
+            page = pdf[i]
+            try:
+                page_text = _pdfium_page_text(page)
+                needs_fallback = _needs_layout_analysis(page, page_text, table_path_threshold, short_line_ratio, min_clean_ratio)
+            finally:
+                page.close()
+
+            if needs_fallback:
+                if plumber_pdf is None:
+                    plumber_pdf = pdfplumber.open(pdf_location)
+                page_text = _pdfplumber_page_text(plumber_pdf.pages[i])
+
+            yield i + 1, page_text # Page numbers are 1-indexed
+    finally:
+        pdf.close()
+        if plumber_pdf is not None:
+            plumber_pdf.close()
+
+def _pdfplumber_page_text(page):
+    """
+    Extracts a page's text with pdfplumber and drops its per-page layout and character caches.
+    """
+    page_text = page.extract_text()
+    page.close()
+    return page_text if page_text else ""
+
+def _extract_page_range(pdf_location, start, end, options):
+    """
+    Extracts (page_number, page_text) pairs for pages [start, end) of a PDF.
+    Runs inside a worker process, so it opens the PDF itself rather than sharing a handle.
+    """
+    return list(_iter_page_range(pdf_location, start, end, **options))
@@ -1,10 +1,119 @@
-import pdfplumber
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
+from classes.util import Util
+from classes.metrics import metrics
+from classes.pdf_extraction import BACKENDS, _page_count, _iter_page_range, _extract_page_range
 
 class PDF_Parser:
-    def __init__(self):
-        print("PDFParser initialized")
+    def __init__(self, workers=None, min_parallel_pages=16, backend="pdfium", table_path_threshold=100, short_line_ratio=0.6, min_clean_ratio=0.95, text_cache=None):
+        """
+        Initializes the PDF parser.
+
+        Args:
+            workers (int, optional): Worker processes used by parse_page_number_parallel. Defaults to the CPU count.
+            min_parallel_pages (int): Documents with fewer pages than this are parsed serially,
+                                      since starting worker processes would cost more than it saves.
+            backend (str): "pdfium" extracts text natively and falls back to pdfplumber per page,
+                           "pdfplumber" uses pdfplumber's layout analysis for every page.
+            table_path_threshold (int): Pages drawing at least this many vector paths are treated as table-heavy.
+            short_line_ratio (float): Pages where at least this share of lines are short fragments are treated as table-heavy.
+            min_clean_ratio (float): Pages where fewer than this share of characters are clean text are treated as low quality.
+            text_cache (Text_Cache, optional): Persistent cache of extracted page text, skipped when None.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown PDF backend '{backend}', expected one of {BACKENDS}")
+        self.workers = workers if workers else (os.cpu_count() or 1)
+        self.min_parallel_pages = min_parallel_pages
+        self.backend = backend
+        self.table_path_threshold = table_path_threshold
+        self.short_line_ratio = short_line_ratio
+        self.min_clean_ratio = min_clean_ratio
+        self.text_cache = text_cache
+        print(f"PDFParser initialized with the {backend} backend")
+
+    def _extract_options(self):
+        """
+        Returns the backend settings passed to the page extraction helpers, including worker processes.
+        """
+        return {
+            "backend": self.backend,
+            "table_path_threshold": self.table_path_threshold,
+            "short_line_ratio": self.short_line_ratio,
+            "min_clean_ratio": self.min_clean_ratio
+        }
     
+    def extractor_key(self):
+        """
+        Identifies the extraction backend, library versions and fallback settings, so cached text
+        is never reused after any of them changes.
+
+        Returns:
+            str: The extractor key used by the text cache.
+        """
+        options = self._extract_options()
+        return ":".join([
+            options["backend"],
+            f"pdfplumber={version('pdfplumber')}",
+            f"pypdfium2={version('pypdfium2')}",
+            f"paths={options['table_path_threshold']}",
+            f"short={options['short_line_ratio']}",
+            f"clean={options['min_clean_ratio']}"
+        ])
+
+    def _with_text_cache(self, pdf_location, content_hash, extract):
+        """
+        Serves a document's pages from the text cache, or extracts them and stores them as they are yielded.
+
+        Args:
+            pdf_location (str): The path to the PDF file.
+            content_hash (str, optional): The SHA-256 hash of the file, computed here if not provided.
+            extract (callable): Returns the page generator used on a cache miss.
+
+        Yields:
+            tuple[int, str]: (page_number, page_text) for each page, in order.
+        """
+        if self.text_cache is None:
+            yield from metrics.timed_iter("parse", extract(), source=pdf_location)
+            return
+
+        if content_hash is None:
+            content_hash = Util.generate_file_hash(pdf_location)
+        extractor = self.extractor_key()
+
+        cached_pages = self.text_cache.iter_pages(content_hash, extractor)
+        if cached_pages is not None:
+            metrics.increment("text_cache_hits")
+            yield from metrics.timed_iter("parse_cached", cached_pages, source=pdf_location)
+            return
+
+        metrics.increment("text_cache_misses")
+        self.text_cache.begin_document(content_hash, extractor)
+        for page_number, page_text in metrics.timed_iter("parse", extract(), source=pdf_location):
+            self.text_cache.add_page(content_hash, extractor, page_number, page_text)
+            yield page_number, page_text
+        # Only reached once every page was extracted, so partial documents are never served
+        self.text_cache.complete_document(content_hash, extractor)
+
+    def iter_pages(self, pdf_location, content_hash=None):
+        """
+        Lazily yields the text of a PDF file one page at a time.
+
+        Unlike the parse methods, errors are raised to the caller instead of being printed.
+
+        Args:
+            pdf_location (str): The path to the PDF file to be parsed.
+            content_hash (str, optional): The SHA-256 hash of the file if the caller already has it.
+
+        Yields:
+            tuple[int, str]: (page_number, page_text) for each page, in order.
+        """
+        yield from self._with_text_cache(
+            pdf_location, content_hash,
+            lambda: _iter_page_range(pdf_location, **self._extract_options())
+        )
+
     def parse(self, pdf_location):
         """
         Parses a PDF file and extracts text from it.
@@ -16,15 +125,8 @@ class PDF_Parser:
             str: The extracted text from the PDF file.
         """
         try:
-            with pdfplumber.open(pdf_location) as pdf:
-                # Initialize an empty string to hold the extracted text
-                full_text = ''
-                
-                # Iterate over each page in the PDF
-                for page in pdf.pages:
-                    # Extract text from the current page and add it to full_text
-                    full_text += page.extract_text() 
-                    
+            # Join the page texts once instead of growing a string page by page
+            full_text = ''.join(page_text for _, page_text in self.iter_pages(pdf_location))
             return full_text.strip()  # Return the text without leading/trailing whitespace
         except Exception as e:
             print(f"Error parsing PDF: {e}")
@@ -32,44 +134,83 @@ class PDF_Parser:
 
     def parse_page_number(self, pdf_location):
         """
-        Parses a PDF file and extracts text from it, optionally with page numbers.
+        Parses a PDF file and extracts text from it with page numbers.
 
         Args:
             pdf_location (str): The path to the PDF file to be parsed.
 
         Returns:
-            str: The extracted text from the PDF file,
-                 with page numbers prepended to each page's content.
-            Or
             list[tuple[int, str]]: A list of tuples, where each tuple contains
                                    (page_number, page_text).
             Returns None if parsing fails.
         """
         try:
-            with pdfplumber.open(pdf_location) as pdf:
-                # Option 1: Concatenate text with page numbers as a single string
-                # full_text = ''
-                # for i, page in enumerate(pdf.pages):
-                #     page_number = i + 1  # Page numbers are 1-indexed
-                #     page_text = page.extract_text()
-                #     if page_text: # Ensure there's text to add
-                #         full_text += f"\n--- Page {page_number} ---\n"
-                #         full_text += page_text
-                # return full_text.strip()
-
-                # Option 2: Return a list of tuples (page_number, page_text)
-                # This is generally more flexible for further processing
-                pages_with_text = []
-                for i, page in enumerate(pdf.pages):
-                    page_number = i + 1  # Page numbers are 1-indexed
-                    page_text = page.extract_text()
-                    pages_with_text.append((page_number, page_text if page_text else ""))
-                
-                return pages_with_text
+            return list(self.iter_pages(pdf_location))
+        except Exception as e:
+            print(f"Error parsing PDF: {e}")
+            return None # Return None if parsing fails
+
+    def iter_pages_parallel(self, pdf_location, workers=None, content_hash=None):
+        """
+        Yields the text of a PDF file in page order while a pool of worker processes extracts
+        contiguous page ranges. pdfminer's layout analysis is pure Python and CPU-bound, so this
+        scales with the number of cores. Small documents fall back to the serial iter_pages.
+
+        Unlike the parse methods, errors are raised to the caller instead of being printed.
+
+        Args:
+            pdf_location (str): The path to the PDF file to be parsed.
+            workers (int, optional): Overrides the number of worker processes for this call.
+            content_hash (str, optional): The SHA-256 hash of the file if the caller already has it.
+
+        Yields:
+            tuple[int, str]: (page_number, page_text) for each page, in order.
+        """
+        yield from self._with_text_cache(
+            pdf_location, content_hash,
+            lambda: self._extract_parallel(pdf_location, workers if workers else self.workers)
+        )
+
+    def _extract_parallel(self, pdf_location, workers):
+        """
+        Extracts page ranges in worker processes and yields them in page order.
+        """
+        page_count = _page_count(pdf_location)
 
+        if workers <= 1 or page_count < self.min_parallel_pages:
+            yield from _iter_page_range(pdf_location, **self._extract_options())
+            return
+
+        # Use a few ranges per worker so one slow range does not leave the others idle
+        range_size = max(1, -(-page_count // (workers * 4)))
+        ranges = [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+
+        # Spawn rather than fork: the pipeline calls this from a background thread of a multithreaded
+        # process, and a spawned worker starts clean, importing only the extraction helpers it runs
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(_extract_page_range, pdf_location, start, end, self._extract_options()) for start, end in ranges]
+            # Yield in submission order so pages stay in document order
+            for future in futures:
+                yield from future.result()
+
+    def parse_page_number_parallel(self, pdf_location, workers=None):
+        """
+        Parses a PDF file across a pool of worker processes, see iter_pages_parallel.
+
+        Args:
+            pdf_location (str): The path to the PDF file to be parsed.
+            workers (int, optional): Overrides the number of worker processes for this call.
+
+        Returns:
+            list[tuple[int, str]]: A list of tuples (page_number, page_text) in page order,
+                                   identical to parse_page_number. Returns None if parsing fails.
+        """
+        try:
+            return list(self.iter_pages_parallel(pdf_location, workers))
         except Exception as e:
             print(f"Error parsing PDF: {e}")
             return None # Return None if parsing fails
+
     def parse_wiki(self, pdf_location):
         """
         Parses a PDF file of a Wikipedia article, removes sections like "References", "Footnotes", and "See also",
@@ -82,29 +223,11 @@ class PDF_Parser:
             str: The extracted text from the PDF file without unwanted sections.
         """
         try:
-            with pdfplumber.open(pdf_location) as pdf:
-                # Combine all pages into a single string
-                full_text = ''
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        full_text += page_text + '\n'
-                
-                # Keywords indicating sections to remove
-                removal_keywords = ["References", "Footnotes", "See also"]
-                
-                # Locate the earliest occurrence of any removal keyword
-                min_index = len(full_text)
-                for keyword in removal_keywords:
-                    index = full_text.find(keyword)
-                    if index != -1 and index < min_index:
-                        min_index = index
-                
-                # Truncate text at the earliest keyword
-                if min_index < len(full_text):
-                    full_text = full_text[:min_index]
+            # Combine all pages into a single string with one join
+            full_text = ''.join(page_text + '\n' for _, page_text in self.iter_pages(pdf_location) if page_text)
             
-            return full_text.strip()  # Return the cleaned text
+            # Remove the trailing reference sections
+            return self.parse_search(full_text)
         except Exception as e:
             print(f"Error parsing PDF: {e}")
             return None
@@ -0,0 +1,130 @@
+import re
+from classes.metrics import metrics
+
+RAG_INSTRUCTIONS = """
+You are an AI assistant integrated into a Retrieval-Augmented Generation (RAG) system. Your primary function is to
+synthesize responses to user questions by combining both retrieved information and your own knowledge, adhering to
+specific guidelines.
+
+**Guidelines for Response:**
+
+1. **Primary Source - Retrieved Information:**
+    - Base your response first on the retrieved information, which serves as your primary source.
+
+2. **Supplement with Personal Knowledge When Necessary:**
+    - If the retrieved information is insufficient, use your own knowledge to fill in gaps.
+    - Clearly state when personal knowledge is used, ensuring a comprehensive response.
+
+3. **Clarity and Attribution:**
+    - Distinguish between information derived from retrieval sources and your own knowledge.
+    - Cite any retrieved information if applicable
+    - Highlight page numbers that data can be found on for user verification
+
+4. **Neutral and Informative Tone:**
+    - Maintain a neutral tone, avoiding assumptions beyond the available information.
+
+5. **Use of Personal Knowledge:**
+    - Apply personal knowledge only when necessary to ensure the response is thorough and accurate.
+"""
+
+class Prompt_Builder:
+    def __init__(self, instructions=RAG_INSTRUCTIONS, context_token_budget=2048, duplicate_threshold=0.8, token_counter=None, verbose=False):
+        """
+        Initializes the synthesis prompt builder.
+
+        The static instructions always come first, so every prompt shares the same long prefix and the
+        Ollama server can reuse its KV cache for it instead of re-evaluating it on every query. Retrieved
+        chunks follow, best first, packed up to a token budget with near-duplicates dropped, and the user
+        question comes last.
+
+        Args:
+            instructions (str): The fixed system instructions placed at the start of every prompt.
+            context_token_budget (int): The maximum number of tokens spent on retrieved context.
+            duplicate_threshold (float): Chunks whose word-trigram Jaccard similarity with an already selected
+                                         chunk reaches this value are dropped as near-duplicates.
+            token_counter (callable, optional): Counts the tokens in a string. Defaults to an estimate of
+                                                one token per four characters.
+            verbose (bool): Whether to print a one-line summary of each selected chunk.
+        """
+        self.instructions = instructions.strip()
+        self.context_token_budget = context_token_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.token_counter = token_counter if token_counter else self.estimate_tokens
+        self.verbose = verbose
+
+    @staticmethod
+    def estimate_tokens(text):
+        """
+        Estimates the token count of a string at roughly four characters per token.
+        """
+        return (len(text) + 3) // 4
+
+    @staticmethod
+    def _shingles(text):
+        """
+        Returns the set of lowercase word trigrams in a string, used for near-duplicate detection.
+        """
+        words = re.findall(r"\w+", text.lower())
+        if len(words) < 3:
+            return {tuple(words)}
+        return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+    @staticmethod
+    def _format_entry(entry):
+        """
+        Formats a retrieved chunk with its attribution line.
+        """
+        metadata = entry["metadata"]
+        return f"{entry['document']}\n[Category: {entry['collection']} - Source: {metadata['source']} - Page: {metadata['page_number']}]"
+
+    def select_context(self, context):
+        """
+        Picks the retrieved chunks that go into the prompt.
+
+        Chunks are taken in retrieval order, skipping near-duplicates of chunks already selected
+        and chunks that would overflow the context token budget.
+
+        Args:
+            context (list): Retrieved results as returned by Vector_Store.query_all_collections, best first.
+
+        Returns:
+            list of tuple: (entry, formatted text) pairs for the selected chunks.
+        """
+        selected = []
+        selected_shingles = []
+        used_tokens = 0
+        for entry in context:
+            shingles = self._shingles(entry["document"])
+            if any(len(shingles & other) / len(shingles | other) >= self.duplicate_threshold for other in selected_shingles):
+                continue
+
+            formatted = self._format_entry(entry)
+            tokens = self.token_counter(formatted)
+            if used_tokens + tokens > self.context_token_budget:
+                continue
+
+            selected.append((entry, formatted))
+            selected_shingles.append(shingles)
+            used_tokens += tokens
+            if self.verbose:
+                print(f"Context Selected: {entry['collection']} - Source: {entry['metadata']['source']} - Page: {entry['metadata']['page_number']} ({tokens} tokens)")
+        return selected
+
+    def build(self, user_query, context):
+        """
+        Builds the synthesis prompt: instructions, then the selected context, then the user question.
+
+        Args:
+            user_query (str): The user's question.
+            context (list): Retrieved results as returned by Vector_Store.query_all_collections, best first.
+
+        Returns:
+            str: The prompt to send to the LLM.
+        """
+        with metrics.span("prompt_build", retrieved=len(context)) as span:
+            selected = self.select_context(context)
+            span.set(selected=len(selected))
+            parts = [self.instructions, "**Retrieved Information:**"]
+            parts.extend(formatted for _, formatted in selected)
+            parts.append(f"User Question:\n{user_query}")
+            return "\n\n".join(parts)
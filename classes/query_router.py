@@ -0,0 +1,90 @@
+import threading
+import numpy as np
+from classes.metrics import metrics
+
+class Query_Router:
+    def __init__(self, scorer, classes, min_probability=0.2, confidence=0.5):
+        """
+        Initializes a router that picks which category collections a query is searched in.
+
+        The query embedding is scored against the category prototypes of an embedding-mode
+        Zero_Shot_Classifier, so routing costs one small matrix product on top of the embedding the
+        search needs anyway. Only categories with at least min_probability are searched. When the
+        best category is below confidence the routing is treated as uncertain and every collection
+        is searched, so an ambiguous query never loses recall.
+
+        Args:
+            scorer (Zero_Shot_Classifier): An embedding-mode classifier whose score_embeddings gives category probabilities.
+            classes (list): The category names, in the order score_embeddings returns them.
+            min_probability (float): The probability a category needs to be searched.
+            confidence (float): The top probability below which every collection is searched.
+        """
+        self.scorer = scorer
+        self.classes = classes
+        self.min_probability = min_probability
+        self.confidence = confidence
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.routed = 0
+        self.collections_searched = 0
+        self.collections_skipped = 0
+        self.search_seconds = 0.0
+        print("Query Router initialized")
+
+    def route(self, query_embedding):
+        """
+        Picks the collections to search for a query.
+
+        Args:
+            query_embedding (list): The embedded query.
+
+        Returns:
+            list: The category names to search, every category when routing is uncertain.
+        """
+        probabilities = self.scorer.score_embeddings([query_embedding])[0]
+        order = np.argsort(probabilities)[::-1]
+        if probabilities[order[0]] < self.confidence:
+            print(f"Routing uncertain (best {self.classes[order[0]]} at {probabilities[order[0]]:.2f}), searching all collections")
+            return list(self.classes)
+        selected = [self.classes[i] for i in order if probabilities[i] >= self.min_probability]
+        print(f"Routed query to {', '.join(f'{self.classes[i]} ({probabilities[i]:.2f})' for i in order if self.classes[i] in selected)}")
+        return selected
+
+    def record(self, searched, seconds):
+        """
+        Records one routed search, for the hit rate and savings in summary.
+
+        Args:
+            searched (int): The number of collections searched.
+            seconds (float): Time spent searching them.
+        """
+        skipped = len(self.classes) - searched
+        with self.lock:
+            self.queries += 1
+            self.routed += 1 if skipped else 0
+            self.collections_searched += searched
+            self.collections_skipped += skipped
+            self.search_seconds += seconds
+        metrics.increment("routing_queries")
+        if skipped:
+            metrics.increment("routing_routed")
+            metrics.increment("routing_collections_skipped", skipped)
+
+    def summary(self):
+        """
+        Returns how often routing narrowed the search and roughly how much search time it saved.
+
+        Returns:
+            dict: The query count, hit rate (share of queries that skipped a collection), mean collections
+                  searched, and the estimated seconds saved, taking a skipped collection to cost the mean
+                  search time of a searched one.
+        """
+        with self.lock:
+            per_collection = self.search_seconds / self.collections_searched if self.collections_searched else 0.0
+            return {
+                "queries": self.queries,
+                "hit_rate": self.routed / self.queries if self.queries else 0.0,
+                "mean_collections_searched": self.collections_searched / self.queries if self.queries else 0.0,
+                "collections_skipped": self.collections_skipped,
+                "estimated_seconds_saved": self.collections_skipped * per_collection
+            }
@@ -1,8 +1,31 @@
-import torch
-from transformers import pipeline
+import gc
+import sys
+from classes.token_batcher import Token_Batcher
+from classes.metrics import metrics
 
 class Summarizer:
-    def __init__(self):
+    def __init__(self, token_budget=4096, model_name="facebook/bart-large-cnn"):
+        """
+        Initializes the summarizer. The model is loaded on first use, so torch is never imported
+        unless something is summarized.
+
+        Args:
+            token_budget (int): Maximum padded input tokens per generation batch in bulk_summarize.
+            model_name (str): The Hugging Face summarization model to load.
+        """
+        self.model_name = model_name
+        self.token_budget = token_budget
+        self.summarizer = None
+
+    def load(self):
+        """
+        Loads the summarization model if it is not already resident. Called automatically on first use.
+        """
+        if self.summarizer is not None:
+            return
+        import torch
+        from transformers import pipeline
+
         # 1. Check for GPU availability using PyTorch
         if torch.cuda.is_available():
             # Use the specified device (defaulting to 'cuda:0')
@@ -11,10 +34,27 @@ class Summarizer:
             # Fallback to CPU
             device = -1
 
-        self.summarizer = pipeline("summarization", model="facebook/bart-large-cnn", device=device)
+        print(f"Loading summarizer model {self.model_name}...")
+        with metrics.span("model_load", model=self.model_name):
+            self.summarizer = pipeline("summarization", model=self.model_name, device=device)
+
+    def unload(self):
+        """
+        Releases the summarization model so its memory is returned once ingestion is finished.
+        """
+        if self.summarizer is None:
+            return
+        self.summarizer = None
+        gc.collect()
+        # Only touch torch if it was imported to load the model
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        print(f"Unloaded summarizer model {self.model_name}")
 
     def summarize(self, text, max_length=150, min_length=30):
         #print(f"Summarizing text: {text}")
+        self.load()
         summarized = self.summarizer(text, max_length=max_length, min_length=min_length, do_sample=False)[0]['summary_text']  
         #print(f"\nSummarized text: {summarized}\n")
         return  summarized
@@ -23,18 +63,24 @@ class Summarizer:
         """
         Summarizes multiple texts in bulk to optimize speed.
 
+        Texts are sorted by token length and packed into batches under the token budget, so short
+        and long chunks are not padded to the same length, then returned in their original order.
+
         Args:
             texts (list of str): A list of texts to summarize.
             max_length (int): The maximum length of each summary.
             min_length (int): The minimum length of each summary.
-            batch_size (int): The number of texts to process in a batch.
+            batch_size (int): The maximum number of texts to process in a batch.
         
         Returns:
             list of str: Summarized texts.
         """
-        summaries = []
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            batch_summaries = self.summarizer(batch, max_length=max_length, min_length=min_length, do_sample=False)
-            summaries.extend([summary['summary_text'] for summary in batch_summaries])
-        return summaries
\ No newline at end of file
+        self.load()
+        batcher = Token_Batcher(self.summarizer.tokenizer, token_budget=self.token_budget, max_batch_size=batch_size)
+
+        def run_batch(batch):
+            batch_summaries = self.summarizer(batch, max_length=max_length, min_length=min_length, do_sample=False, truncation=True, batch_size=len(batch))
+            return [summary['summary_text'] for summary in batch_summaries]
+
+        with metrics.span("summarize", chunks=len(texts)):
+            return batcher.run(texts, run_batch)
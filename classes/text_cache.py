@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+class Text_Cache:
+    def __init__(self, cache_path, max_bytes=512 * 1024 * 1024, compression_level=6):
+        """
+        Initializes a persistent on-disk cache of per-page extracted PDF text.
+
+        Documents are keyed by the SHA-256 of the file contents plus an extractor key (backend,
+        library versions and fallback settings), so a changed file or extractor never returns stale
+        text. Page text is zlib-compressed in a single sqlite file, and whole documents are evicted
+        least recently used first once the compressed size passes max_bytes.
+
+        Args:
+            cache_path (str): The sqlite file the cache is stored in.
+            max_bytes (int): The maximum total size of compressed page text kept on disk.
+            compression_level (int): The zlib compression level used for page text.
+        """
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                content_hash TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                complete INTEGER NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (content_hash, extractor)
+            )""")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                content_hash TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                page_number INTEGER NOT NULL,
+                text BLOB NOT NULL,
+                PRIMARY KEY (content_hash, extractor, page_number)
+            )""")
+        self.connection.commit()
+        print("Text Cache initialized")
+
+    def iter_pages(self, content_hash, extractor, batch_size=64):
+        """
+        Yields the cached pages of a document, reading them from disk a batch at a time.
+
+        Args:
+            content_hash (str): The SHA-256 hash of the PDF file contents.
+            extractor (str): The extractor key the pages were stored under.
+            batch_size (int): The number of pages read from sqlite per query.
+
+        Returns:
+            generator: (page_number, page_text) pairs in page order, or None if the document is not fully cached.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT complete FROM documents WHERE content_hash = ? AND extractor = ?",
+                (content_hash, extractor)
+            ).fetchone()
+            if row is None or not row[0]:
+                return None
+            self.connection.execute(
+                "UPDATE documents SET last_used = ? WHERE content_hash = ? AND extractor = ?",
+                (time.time(), content_hash, extractor)
+            )
+            self.connection.commit()
+        return self._read_pages(content_hash, extractor, batch_size)
+
+    def _read_pages(self, content_hash, extractor, batch_size):
+        """
+        Streams the stored pages of a fully cached document.
+        """
+        last_page = 0
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    "SELECT page_number, text FROM pages WHERE content_hash = ? AND extractor = ? AND page_number > ? ORDER BY page_number LIMIT ?",
+                    (content_hash, extractor, last_page, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for page_number, text in rows:
+                yield page_number, zlib.decompress(text).decode('utf-8')
+            last_page = rows[-1][0]
+
+    def begin_document(self, content_hash, extractor):
+        """
+        Starts (or restarts) caching a document, discarding any partially stored pages.
+
+        Args:
+            content_hash (str): The SHA-256 hash of the PDF file contents.
+            extractor (str): The extractor key the pages are stored under.
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM pages WHERE content_hash = ? AND extractor = ?", (content_hash, extractor))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO documents (content_hash, extractor, size, complete, last_used) VALUES (?, ?, 0, 0, ?)",
+                (content_hash, extractor, time.time())
+            )
+            self.connection.commit()
+
+    def add_page(self, content_hash, extractor, page_number, page_text):
+        """
+        Stores one compressed page of a document started with begin_document.
+
+        Args:
+            content_hash (str): The SHA-256 hash of the PDF file contents.
+            extractor (str): The extractor key the pages are stored under.
+            page_number (int): The 1-indexed page number.
+            page_text (str): The extracted page text.
+        """
+        compressed = zlib.compress(page_text.encode('utf-8'), self.compression_level)
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages (content_hash, extractor, page_number, text) VALUES (?, ?, ?, ?)",
+                (content_hash, extractor, page_number, compressed)
+            )
+            self.connection.execute(
+                "UPDATE documents SET size = size + ? WHERE content_hash = ? AND extractor = ?",
+                (len(compressed), content_hash, extractor)
+            )
+
+    def complete_document(self, content_hash, extractor):
+        """
+        Marks a document as fully cached, commits its pages and evicts old documents past the size limit.
+
+        Args:
+            content_hash (str): The SHA-256 hash of the PDF file contents.
+            extractor (str): The extractor key the pages are stored under.
+        """
+        with self.lock:
+            self.connection.execute(
+                "UPDATE documents SET complete = 1, last_used = ? WHERE content_hash = ? AND extractor = ?",
+                (time.time(), content_hash, extractor)
+            )
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self):
+        """
+        Deletes least recently used documents until the cache fits in max_bytes. Caller must hold the lock.
+        """
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Documents still being written are left alone unless they were abandoned over an hour ago
+        for content_hash, extractor, size in self.connection.execute(
+            "SELECT content_hash, extractor, size FROM documents WHERE complete = 1 OR last_used < ? ORDER BY last_used ASC",
+            (time.time() - 3600,)
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self.connection.execute("DELETE FROM pages WHERE content_hash = ? AND extractor = ?", (content_hash, extractor))
+            self.connection.execute("DELETE FROM documents WHERE content_hash = ? AND extractor = ?", (content_hash, extractor))
+            total -= size
+
+    def clear(self):
+        """
+        Removes every cached document.
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM pages")
+            self.connection.execute("DELETE FROM documents")
+            self.connection.commit()
+
+    def close(self):
+        """
+        Closes the underlying sqlite connection.
+        """
+        with self.lock:
+            self.connection.close()
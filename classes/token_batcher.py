@@ -0,0 +1,128 @@
+class Token_Batcher:
+    def __init__(self, tokenizer, token_budget=4096, max_batch_size=64, max_length=None):
+        """
+        Initializes a length-bucketed, token-budgeted batcher shared by the transformer models.
+
+        Inputs are sorted by token length and packed so that each batch's padded size
+        (rows x longest sequence) stays under token_budget. This removes most of the padding
+        waste of mixing short and long chunks and keeps peak activation memory predictable.
+        Batches run under torch.inference_mode, are split in half and retried when they run out
+        of memory, and results are returned in the original input order.
+
+        Args:
+            tokenizer (PreTrainedTokenizer): The model's tokenizer, used only to measure input lengths.
+            token_budget (int): The maximum padded tokens (rows x longest sequence) per forward batch.
+            max_batch_size (int): The maximum number of inputs per batch, regardless of length.
+            max_length (int, optional): The length inputs are truncated to. Defaults to the tokenizer's model_max_length.
+        """
+        self.tokenizer = tokenizer
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        model_max_length = getattr(tokenizer, "model_max_length", None)
+        # Tokenizers without a real limit report a huge sentinel value
+        if max_length is None and model_max_length and model_max_length < 100000:
+            max_length = model_max_length
+        self.max_length = max_length
+
+    def token_lengths(self, texts):
+        """
+        Measures the tokenized length of each text, capped at max_length.
+
+        Args:
+            texts (list of str): The inputs to measure.
+
+        Returns:
+            list of int: The token count of each text.
+        """
+        encoded = self.tokenizer(
+            list(texts),
+            truncation=self.max_length is not None,
+            max_length=self.max_length
+        )
+        return [len(input_ids) for input_ids in encoded["input_ids"]]
+
+    def plan(self, texts, rows_per_text=1, extra_tokens=0):
+        """
+        Groups input indexes into batches of similar length that fit the token budget.
+
+        Args:
+            texts (list of str): The inputs to batch.
+            rows_per_text (int): Forward rows each input expands to (e.g. one per candidate label in zero-shot NLI).
+            extra_tokens (int): Tokens added to every row by the model's prompt (e.g. the NLI hypothesis).
+
+        Returns:
+            list of list of int: Batches of indexes into texts, shortest inputs first.
+        """
+        if not texts:
+            return []
+        lengths = self.token_lengths(texts)
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+
+        batches = []
+        batch = []
+        for index in order:
+            # Inputs arrive in ascending length, so this one sets the batch's padded length
+            padded_length = lengths[index] + extra_tokens
+            if batch and (
+                len(batch) >= self.max_batch_size
+                or (len(batch) + 1) * rows_per_text * padded_length > self.token_budget
+            ):
+                batches.append(batch)
+                batch = []
+            batch.append(index)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    @staticmethod
+    def _is_out_of_memory(error):
+        """
+        Recognises CUDA and CPU allocator failures.
+        """
+        if isinstance(error, MemoryError):
+            return True
+        import torch
+        out_of_memory_error = getattr(torch.cuda, "OutOfMemoryError", None)
+        if out_of_memory_error is not None and isinstance(error, out_of_memory_error):
+            return True
+        message = str(error).lower()
+        return isinstance(error, RuntimeError) and ("out of memory" in message or "can't allocate memory" in message)
+
+    def _run_with_backoff(self, run_batch, batch_texts):
+        """
+        Runs one batch, splitting it in half and retrying each half if it runs out of memory.
+        """
+        try:
+            return list(run_batch(batch_texts))
+        except Exception as e:
+            if not self._is_out_of_memory(e) or len(batch_texts) == 1:
+                raise
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            middle = len(batch_texts) // 2
+            print(f"Out of memory on a batch of {len(batch_texts)}, retrying as two batches of {middle} and {len(batch_texts) - middle}")
+            return self._run_with_backoff(run_batch, batch_texts[:middle]) + self._run_with_backoff(run_batch, batch_texts[middle:])
+
+    def run(self, texts, run_batch, rows_per_text=1, extra_tokens=0):
+        """
+        Runs a model over every text in token-budgeted batches and restores the input order.
+
+        Args:
+            texts (list of str): The inputs.
+            run_batch (callable): Takes a list of texts and returns one result per text, in order.
+            rows_per_text (int): Forward rows each input expands to, see plan.
+            extra_tokens (int): Tokens the model's prompt adds to every row, see plan.
+
+        Returns:
+            list: One result per text, in the order of texts.
+        """
+        # Imported here so that loading this module never pulls in torch
+        import torch
+        results = [None] * len(texts)
+        with torch.inference_mode():
+            for batch in self.plan(texts, rows_per_text, extra_tokens):
+                batch_results = self._run_with_backoff(run_batch, [texts[i] for i in batch])
+                for index, result in zip(batch, batch_results):
+                    results[index] = result
+        return results
@@ -2,6 +2,9 @@ import hashlib
 import re
 
 class Util:
+    # Strength of a break between two tokens, chunks prefer to end at the strongest break available
+    _BREAK_NONE, _BREAK_PUNCTUATION, _BREAK_WORD, _BREAK_SENTENCE, _BREAK_PARAGRAPH = 0, 1, 2, 3, 4
+
     def __init__(self):
         print("Utility initialized")
     
@@ -9,6 +12,24 @@ class Util:
     def generate_hash(text):
     # Generate a SHA-256 hash of the chunk content (document)
         return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def generate_file_hash(file_path, block_size=1024 * 1024):
+        """
+        Generates a SHA-256 hash of a file's contents, reading it in blocks.
+
+        Args:
+            file_path (str): The path to the file to hash.
+            block_size (int): The number of bytes read at a time.
+
+        Returns:
+            str: The hex digest of the file contents.
+        """
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
     
     @staticmethod   
     def chunk(text, chunk_size):
@@ -103,4 +124,112 @@ class Util:
         if current_chunk.strip():
             final_chunks.append(current_chunk.strip())
 
-        return final_chunks
\ No newline at end of file
+        return final_chunks
+
+    @staticmethod
+    def chunk_tokens(text, tokenizer, max_tokens, overlap_tokens=0, min_fill=0.5):
+        """
+        Chunks text so every chunk fits the embedding model's token window.
+
+        The text is tokenized once and chunks are cut on token offsets in a single linear pass.
+        Each chunk ends at the last paragraph break that keeps it at least min_fill of max_tokens,
+        falling back to the last sentence end, then the last word boundary, then punctuation inside a
+        long token run such as a URL, and only splits inside a word when nothing else fits. Consecutive
+        paragraphs are packed together while they fit. Pieces of a split word can tokenize differently
+        on their own, so those rare chunks are re-encoded and shortened until they fit.
+
+        Args:
+            text (str): The text to be chunked.
+            tokenizer (tokenizers.Tokenizer): A fast tokenizer returning character offsets, with truncation
+                                              and padding disabled (see Vector_Store.get_tokenizer).
+            max_tokens (int): The maximum tokens per chunk, excluding the model's special tokens.
+            overlap_tokens (int): Tokens repeated from the end of one chunk at the start of the next,
+                                  snapped forward to a word boundary. Must be less than half of max_tokens.
+            min_fill (float): The fraction of max_tokens a chunk must reach before a paragraph or
+                              sentence break is preferred over a later, weaker break.
+
+        Returns:
+            list: A list of text chunks.
+        """
+        if not text or not text.strip():
+            print("No text to chunk.")
+            return []
+        if overlap_tokens * 2 >= max_tokens:
+            raise ValueError("overlap_tokens must be less than half of max_tokens")
+
+        offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+        token_count = len(offsets)
+        if token_count == 0:
+            return []
+
+        # breaks[i] is the strength of the break just before token i
+        breaks = [Util._BREAK_PARAGRAPH] + [Util._BREAK_NONE] * token_count
+        for i in range(1, token_count):
+            gap = text[offsets[i - 1][1]:offsets[i][0]]
+            if not gap:
+                # Tokenizers split on punctuation before anything else, so cutting there is stable
+                if not text[offsets[i - 1][1] - 1].isalnum() or not text[offsets[i][0]].isalnum():
+                    breaks[i] = Util._BREAK_PUNCTUATION
+                continue
+            if gap.count("\n") >= 2:
+                breaks[i] = Util._BREAK_PARAGRAPH
+            elif gap.isspace() and text[offsets[i - 1][1] - 1] in ".!?:;":
+                breaks[i] = Util._BREAK_SENTENCE
+            else:
+                # Whitespace, or characters the tokenizer skipped, separate words
+                breaks[i] = Util._BREAK_WORD
+        breaks[token_count] = Util._BREAK_PARAGRAPH
+
+        # last_break[level][i] is the latest index <= i whose break is at least that strong
+        last_break = []
+        for level in range(Util._BREAK_PARAGRAPH + 1):
+            latest = []
+            current = 0
+            for i, strength in enumerate(breaks):
+                if strength >= level:
+                    current = i
+                latest.append(current)
+            last_break.append(latest)
+
+        chunks = []
+        start = 0
+        min_length = max(1, int(max_tokens * min_fill))
+        while start < token_count:
+            limit = min(start + max_tokens, token_count)
+            end = limit
+            if limit < token_count:
+                end = 0
+                for level in (Util._BREAK_PARAGRAPH, Util._BREAK_SENTENCE):
+                    candidate = last_break[level][limit]
+                    if candidate - start >= min_length:
+                        end = candidate
+                        break
+                if not end:
+                    for level in (Util._BREAK_WORD, Util._BREAK_PUNCTUATION):
+                        candidate = last_break[level][limit]
+                        if candidate > start:
+                            end = candidate
+                            break
+                if not end:
+                    # A single word longer than the budget is cut mid-word
+                    end = limit
+
+            if breaks[start] == Util._BREAK_NONE or breaks[end] == Util._BREAK_NONE:
+                while end - start > 1 and len(tokenizer.encode(text[offsets[start][0]:offsets[end - 1][1]], add_special_tokens=False).ids) > max_tokens:
+                    end -= 1
+
+            chunk = text[offsets[start][0]:offsets[end - 1][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= token_count:
+                break
+
+            next_start = end
+            if overlap_tokens:
+                # Step back by the overlap, then forward to the next word start so no word is split
+                next_start = max(start + 1, end - overlap_tokens)
+                while next_start < end and breaks[next_start] < Util._BREAK_WORD:
+                    next_start += 1
+            start = next_start
+
+        return chunks
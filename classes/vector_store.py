@@ -1,22 +1,87 @@
 from datetime import datetime
 from typing import Collection
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import heapq
+import time
+import numpy as np
 import chromadb
 from chromadb.utils import embedding_functions
 import uuid
+from classes.util import Util
+from classes.embedding_cache import Embedding_Cache
+from classes.lexical_index import Lexical_Index
+from classes.metrics import metrics
 
 class Vector_Store:
-    def __init__(self, storage_path):
+    def __init__(self, storage_path, query_workers=4, embedding_cache_path=None, embedding_batch_size=64, upsert_batch_size=1024, embedding_workers=1,
+                 lexical_index_path=None):
         """
         Initializes the vector store to a local copy using the default embeddings model
 
         Args:
             storage_path (string): A file location that the vector store will be saved in (local)
+            query_workers (int): Number of threads used to search the cached collections concurrently
+            embedding_cache_path (string, optional): Directory of a persistent embedding cache, so chunks that were
+                                                     embedded before are never run through the model again
+            embedding_batch_size (int): Number of uncached documents embedded per call to the embedding function
+            upsert_batch_size (int): Number of documents written per upsert, capped at the client's maximum batch size
+            embedding_workers (int): Batches embedded ahead of the one being written. The embedding model already
+                                     uses every core, so more than one or two only oversubscribes the CPU.
+            lexical_index_path (string, optional): A sqlite file for a BM25 index kept in step with every write,
+                                                   needed by query_hybrid.
         """
         self.client = chromadb.PersistentClient(path=storage_path)
+        # Chroma rejects writes larger than its maximum batch size, older clients do not report one
+        try:
+            max_batch_size = self.client.get_max_batch_size()
+        except Exception:
+            max_batch_size = upsert_batch_size
+        self._setup(query_workers, embedding_cache_path, embedding_batch_size, min(upsert_batch_size, max_batch_size), embedding_workers, lexical_index_path)
+        print("Vector Store initialized")
+
+    def _setup(self, query_workers, embedding_cache_path, embedding_batch_size, upsert_batch_size, embedding_workers, lexical_index_path=None):
+        """
+        Sets up the embedding function, caches and thread pools shared by every storage backend.
+        """
         self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        # Identifies the embedding model so persisted indexes can tell when it changes
+        self.embedding_model_name = getattr(self.embedding_function, "MODEL_NAME", type(self.embedding_function).__name__)
+        self.embedding_batch_size = embedding_batch_size
+        self.chunk_tokenizer = None
+        self.embedding_cache = Embedding_Cache(embedding_cache_path, self.embedding_model_name) if embedding_cache_path else None
+        self.lexical_index = Lexical_Index(lexical_index_path) if lexical_index_path else None
         self.cached_collections = {}
-        print("Vector Store initialized")
+        # Callbacks told which chunk IDs were written or deleted, None meaning everything may have changed
+        self.change_listeners = []
+        # Shared pool used to fan a single query out across the cached collections
+        self.query_executor = ThreadPoolExecutor(max_workers=query_workers, thread_name_prefix="vector_store_query")
+        self.upsert_batch_size = max(1, upsert_batch_size)
+        # The embedding model already runs on every core, so a small prefetch depth overlaps embedding
+        # with writing without oversubscribing the CPU
+        self.embedding_workers = max(1, embedding_workers or 1)
+        self.embedding_executor = ThreadPoolExecutor(max_workers=self.embedding_workers, thread_name_prefix="vector_store_embed")
         
+    def add_change_listener(self, listener):
+        """
+        Registers a callback that is told whenever documents are written or deleted, so caches built
+        on stored chunks (such as cached answers) can invalidate themselves.
+
+        Args:
+            listener (callable): Called with the list of affected ids, or None when a whole collection was deleted.
+        """
+        self.change_listeners.append(listener)
+
+    def _notify_changed(self, ids):
+        """
+        Tells every registered listener which ids changed.
+        """
+        for listener in self.change_listeners:
+            try:
+                listener(ids)
+            except Exception as e:
+                print(f"Error notifying vector store change listener: {e}")
+
     def heartbeat(self):
         """
         Checks the connection of the local client
@@ -32,7 +97,7 @@ class Vector_Store:
             collection_list (list): A list of collection names to be cached
         """    
         for collection_name in collection_list:    
-            collection = self.client.get_collection(name=collection_name)
+            collection = self.client.get_collection(name=collection_name, embedding_function=self.embedding_function)
             self.cached_collections[collection_name] = collection
             
     def create_collection(self, collection_name):
@@ -50,6 +115,14 @@ class Vector_Store:
         if cached_collection is not None:
             return cached_collection
 
+        # Reopen the collection if it already exists in the persistent store
+        try:
+            collection = self.client.get_collection(name=collection_name, embedding_function=self.embedding_function)
+            self.cached_collections[collection_name] = collection
+            return collection
+        except Exception:
+            pass
+
         # If the collection does not exist, create it
         collection = self.client.create_collection(
             name=collection_name,
@@ -62,6 +135,19 @@ class Vector_Store:
         self.cached_collections[collection_name] = collection
         return collection
 
+    def open_collection(self, collection_name):
+        """
+        Opens a collection, creating it if needed, without caching it. Used for internal indexes
+        (such as the page index) that query_all_collections must not search.
+
+        Args:
+            collection_name (str): The name of the collection.
+
+        Returns:
+            object: The collection object.
+        """
+        return self.client.get_or_create_collection(name=collection_name, embedding_function=self.embedding_function)
+
     def create_collections(self, collection_list):
         """
         Creates multiple collections based on the provided list of collection names.
@@ -105,7 +191,7 @@ class Vector_Store:
             return cached_collection
 
         # If the collection is not found in the cache, fetch it from the client
-        collection = self.client.get_collection(name=collection_name)
+        collection = self.client.get_collection(name=collection_name, embedding_function=self.embedding_function)
         # Cache the fetched collection for future requests
         self.cached_collections[collection_name] = collection
         return collection
@@ -130,46 +216,184 @@ class Vector_Store:
         if id is None:
             id = str(uuid.uuid4())
 
-        # Retrieve the specified collection
-        collection = self.get_collection(collection_name)
-        # Add the document to the collection with the associated metadata and ID
-        collection.add(
-            documents=[document],
-            metadatas=[metadata],
-            ids=[id]
-        )
+        # Single documents go through the same upsert path as bulk writes
+        self.add_documents(collection_name, [document], [metadata], [id])
 
-        
-    #Adds a set of documents to the given collection, requires properly formated ids and sources corresponding to each document
-    #While this is recommended over adding a single document at a time, it requires significantly more overhead    
-    def add_documents(self, collection_name, documents, metadata, ids):
+    def embed_documents(self, documents):
+        """
+        Embeds documents, serving repeats from the embedding cache and embedding only the misses in batches.
+
+        Args:
+            documents (list): The document texts to embed.
+
+        Returns:
+            list: One embedding per document, in order.
+        """
+        if self.embedding_cache is None:
+            with metrics.span("embed", chunks=len(documents)):
+                return list(self.embedding_function(documents))
+
+        chunk_hashes = [Util.generate_hash(document) for document in documents]
+        cached = self.embedding_cache.get_many(chunk_hashes)
+        misses = {}
+        for chunk_hash, document in zip(chunk_hashes, documents):
+            if chunk_hash not in cached and chunk_hash not in misses:
+                misses[chunk_hash] = document
+
+        miss_hashes = list(misses)
+        metrics.increment("embedding_cache_hits", len(documents) - len(miss_hashes))
+        metrics.increment("embedding_cache_misses", len(miss_hashes))
+        for i in range(0, len(miss_hashes), self.embedding_batch_size):
+            batch_hashes = miss_hashes[i:i + self.embedding_batch_size]
+            with metrics.span("embed", chunks=len(batch_hashes)):
+                batch_embeddings = self.embedding_function([misses[chunk_hash] for chunk_hash in batch_hashes])
+            self.embedding_cache.put_many(batch_hashes, batch_embeddings)
+            cached.update(zip(batch_hashes, batch_embeddings))
+        return [cached[chunk_hash] for chunk_hash in chunk_hashes]
+
+    def add_documents(self, collection_name, documents, metadata, ids, embeddings=None):
+        """
+        Bulk-upserts documents into the given collection.
+
+        Documents are written in batches no larger than the client accepts. Embeddings for upcoming
+        batches are computed on the embedding thread pool while the current batch is written, and
+        upsert is used so re-adding an existing ID replaces it instead of failing.
+
+        Args:
+            collection_name (str): The name of the collection to write to.
+            documents (list): The documents to add.
+            metadata (list): One metadata dict per document.
+            ids (list): One unique ID per document.
+            embeddings (list, optional): Precomputed embeddings, skipping the embedding function entirely.
+
+        Returns:
+            float: The throughput of the write in chunks per second.
+        """
+        if not documents:
+            return 0.0
+        start = time.perf_counter()
         collection = self.get_collection(collection_name)
-        collection.add(
-            documents=documents,
-            metadatas=metadata,
-            ids=ids
-        )
-    
-    #Queries the given collection returning num_documents that match the plaintext query
-    def query_collection(self, collection_name, query_text, num_documents=5):
+        if embeddings is not None and self.embedding_cache is not None:
+            self.embedding_cache.put_many([Util.generate_hash(document) for document in documents], embeddings)
+
+        batch_starts = range(0, len(documents), self.upsert_batch_size)
+        pending = deque()
+        next_batch = iter(batch_starts)
+
+        def submit_next():
+            batch_start = next(next_batch, None)
+            if batch_start is None:
+                return
+            batch_end = batch_start + self.upsert_batch_size
+            if embeddings is not None:
+                pending.append((batch_start, batch_end, None, embeddings[batch_start:batch_end]))
+            else:
+                future = self.embedding_executor.submit(self.embed_documents, documents[batch_start:batch_end])
+                pending.append((batch_start, batch_end, future, None))
+
+        # Keep one batch per embedding worker in flight ahead of the writer
+        for _ in range(self.embedding_workers + 1):
+            submit_next()
+        try:
+            while pending:
+                batch_start, batch_end, future, batch_embeddings = pending.popleft()
+                if future is not None:
+                    batch_embeddings = future.result()
+                submit_next()
+                with metrics.span("chroma_upsert", collection=collection_name, chunks=batch_end - batch_start):
+                    collection.upsert(
+                        documents=documents[batch_start:batch_end],
+                        metadatas=metadata[batch_start:batch_end],
+                        ids=ids[batch_start:batch_end],
+                        embeddings=batch_embeddings
+                    )
+                if self.lexical_index is not None:
+                    with metrics.span("lexical_index", collection=collection_name, chunks=batch_end - batch_start):
+                        self.lexical_index.add(collection_name, ids[batch_start:batch_end], documents[batch_start:batch_end])
+        finally:
+            # Do not leave embeddings running for a write that failed
+            for _, _, future, _ in pending:
+                if future is not None:
+                    future.cancel()
+            self._notify_changed(ids)
+
+        elapsed = time.perf_counter() - start
+        chunks_per_second = len(documents) / elapsed if elapsed > 0 else float("inf")
+        # Runs for every collection of every micro-batch, so it is reported through metrics rather than printed
+        metrics.increment("chunks_upserted", len(documents))
+        metrics.observe("upsert", elapsed, collection=collection_name)
+        return chunks_per_second
+
+    #Queries the given collection returning num_documents that match the plaintext query, optionally filtered by a where clause
+    def query_collection(self, collection_name, query_text, num_documents=5, where=None):
         collection = self.get_collection(collection_name)
+        filters = {"where": where} if where else {}
         return collection.query(
             query_texts=[query_text],
-            n_results=num_documents
+            n_results=num_documents,
+            **filters
         )
+
+    @staticmethod
+    def build_where(source=None, pages=None, classification=None, min_confidence=None):
+        """
+        Builds a Chroma where clause from the chunk metadata filters.
+
+        Args:
+            source (str or list, optional): The source document name, or a list of names.
+            pages (tuple, optional): An inclusive (first, last) page_number range, either end may be None.
+            classification (str or list, optional): The category, or a list of categories.
+            min_confidence (float, optional): The lowest classification confidence kept.
+
+        Returns:
+            dict: The where clause, or None when no filter is set.
+        """
+        conditions = []
+        for key, value in (("source", source), ("classification", classification)):
+            if isinstance(value, (list, tuple, set)):
+                conditions.append({key: {"$in": list(value)}})
+            elif value is not None:
+                conditions.append({key: {"$eq": value}})
+        if pages is not None:
+            first, last = pages
+            if first is not None:
+                conditions.append({"page_number": {"$gte": first}})
+            if last is not None:
+                conditions.append({"page_number": {"$lte": last}})
+        if min_confidence is not None:
+            conditions.append({"confidence": {"$gte": min_confidence}})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
     
     #Queries all collections by a list of ids, returning the ids found as a singular list
     def query_collections_by_ids(self, ids):
         document_ids = []
         for collection_name, collection in self.cached_collections.items():
-            query_result = collection.get(
-	            ids=ids
-            )
+            with metrics.span("chroma_get", collection=collection_name, ids=len(ids)):
+                query_result = collection.get(
+                    ids=ids
+                )
             if query_result:
                 document_ids.extend(query_result["ids"])
         return document_ids
         
 
+    #Deletes the given ids from every cached collection, ids that do not exist are ignored
+    def delete_documents(self, ids):
+        if not ids:
+            return
+        for collection_name, collection in self.cached_collections.items():
+            try:
+                existing_ids = collection.get(ids=ids, include=[])["ids"]
+                if existing_ids:
+                    collection.delete(ids=existing_ids)
+            except Exception as e:
+                print(f"Error deleting documents from collection '{collection_name}': {e}")
+        if self.lexical_index is not None:
+            self.lexical_index.remove(ids)
+        self._notify_changed(list(ids))
+
     #Deletes a collection of the given name, mostly used for debugging purposes
     def delete_collection(self, collection_name):
         try:
@@ -180,6 +404,9 @@ class Vector_Store:
             self.client.delete_collection(name=collection_name)
         except Exception as e:
             print(f"Error occured while deleting collection from client:\n{e}")
+        if self.lexical_index is not None:
+            self.lexical_index.remove_collection(collection_name)
+        self._notify_changed(None)
         print(f"Deleted Collection: {collection_name}")
             
     #Deletes all collections in the collection_list, used for resetting the state of the persistent db, mainly debugging
@@ -187,27 +414,224 @@ class Vector_Store:
         for collection_name in collection_list:
             self.delete_collection(collection_name)
     
-    # Queries all collections and returns the top k documents across all collections
-    def query_all_collections(self, query_text, k=5):
-        results = []
+    def get_tokenizer(self):
+        """
+        Returns the embedding model's tokenizer for token-aware chunking.
 
-        for collection_name, collection in self.cached_collections.items():
-            try:
+        The embedding function's own tokenizer truncates and pads every input to the model window, so
+        a copy is returned with both disabled, leaving the original untouched.
+
+        Returns:
+            tuple: (tokenizer, max_tokens), where max_tokens is the model window minus the special
+                   tokens added to every input, or (None, None) if the embedding function has no
+                   accessible tokenizer.
+        """
+        if self.chunk_tokenizer is not None:
+            return self.chunk_tokenizer
+        try:
+            # The default ONNX model ships its tokenizer with the weights, fetched on first use
+            download = getattr(self.embedding_function, "_download_model_if_not_exists", None)
+            if download is not None:
+                download()
+            tokenizer = self.embedding_function.tokenizer
+            truncation = tokenizer.truncation
+            tokenizer = type(tokenizer).from_str(tokenizer.to_str())
+        except Exception as e:
+            print(f"Embedding function has no usable tokenizer: {e}")
+            # Remember the failure so it is not retried for every page
+            self.chunk_tokenizer = (None, None)
+            return self.chunk_tokenizer
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+        window = truncation["max_length"] if truncation else 512
+        special_tokens = len(tokenizer.encode("", add_special_tokens=True).ids)
+        self.chunk_tokenizer = (tokenizer, window - special_tokens)
+        return self.chunk_tokenizer
+
+    def embed_query(self, query_text):
+        """
+        Embeds a plaintext query with the same embedding function used by the collections.
+
+        Args:
+            query_text (str): The query to embed.
+
+        Returns:
+            list: The query embedding as a list of floats.
+        """
+        with metrics.span("embed_query"):
+            embedding = self.embedding_function([query_text])[0]
+        return [float(value) for value in embedding]
+
+    def _query_collection_by_embedding(self, collection_name, collection, query_embedding, k, where=None, ids=None):
+        """
+        Searches a single collection with a precomputed query embedding.
+
+        Args:
+            collection_name (str): The name of the collection, attached to each result.
+            collection (object): The collection to search.
+            query_embedding (list): The embedded query.
+            k (int): The number of documents to return.
+            where (dict, optional): A where clause applied before ranking, see build_where.
+            ids (list, optional): Only rank these chunks.
+
+        Returns:
+            list: Result dicts in the shape returned by query_all_collections, empty if the query failed.
+        """
+        if ids is not None:
+            return self._rank_ids_by_embedding(collection_name, collection, query_embedding, k, where, ids)
+        results = []
+        try:
+            with metrics.span("chroma_query", collection=collection_name):
+                filters = {"where": where} if where else {}
                 query_result = collection.query(
-                    query_texts=[query_text],
-                    n_results=k
+                    query_embeddings=[query_embedding],
+                    n_results=k,
+                    **filters
                 )
-                for i in range(len(query_result["documents"][0])):
-                    results.append({
-                        "collection": collection_name,
-                        "document": query_result["documents"][0][i],
-                        "metadata": query_result["metadatas"][0][i],
-                        "id": query_result["ids"][0][i],
-                        "score": query_result["distances"][0][i]
-                    })
+            for i in range(len(query_result["documents"][0])):
+                results.append({
+                    "collection": collection_name,
+                    "document": query_result["documents"][0][i],
+                    "metadata": query_result["metadatas"][0][i],
+                    "id": query_result["ids"][0][i],
+                    "score": query_result["distances"][0][i]
+                })
+        except Exception as e:
+            print(f"Error querying collection '{collection_name}': {e}")
+        return results
+
+    def _rank_ids_by_embedding(self, collection_name, collection, query_embedding, k, where, ids):
+        """
+        Ranks a fixed set of chunks in a single collection exactly, by squared L2 distance to the query
+        like the collections themselves. Used when a coarse search has already picked the candidates.
+
+        Returns:
+            list: Result dicts in the shape returned by query_all_collections, empty if the fetch failed.
+        """
+        results = []
+        try:
+            with metrics.span("chroma_get", collection=collection_name, ids=len(ids)):
+                filters = {"where": where} if where else {}
+                found = {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+                for start in range(0, len(ids), self.upsert_batch_size):
+                    batch = collection.get(ids=ids[start:start + self.upsert_batch_size], include=["embeddings", "documents", "metadatas"], **filters)
+                    for key in found:
+                        found[key].extend(batch[key])
+            if not found["ids"]:
+                return results
+            vectors = np.asarray(found["embeddings"], dtype=np.float32)
+            distances = ((vectors - np.asarray(query_embedding, dtype=np.float32)) ** 2).sum(axis=1)
+            for i in np.argsort(distances)[:k]:
+                results.append({
+                    "collection": collection_name,
+                    "document": found["documents"][i],
+                    "metadata": found["metadatas"][i],
+                    "id": found["ids"][i],
+                    "score": float(distances[i])
+                })
+        except Exception as e:
+            print(f"Error ranking chunks in collection '{collection_name}': {e}")
+        return results
+
+    # Queries all collections and returns the top k documents across all collections
+    def query_all_collections(self, query_text, k=5, collections=None, query_embedding=None, where=None, ids=None):
+        """
+        Args:
+            query_text (str): The query.
+            k (int): The number of documents to return.
+            collections (list, optional): Names of the cached collections to search, every cached collection when None.
+            query_embedding (list, optional): The query's embedding, if the caller already computed it.
+            where (dict, optional): A metadata where clause applied in every collection, see build_where.
+            ids (list, optional): Only rank these chunks, ranked exactly rather than through the index.
+        """
+        if collections is None:
+            targets = list(self.cached_collections.items())
+        else:
+            targets = [(name, self.cached_collections[name]) for name in collections if name in self.cached_collections]
+        with metrics.span("retrieve", collections=len(targets), k=k, filtered=where is not None):
+            # Embed the query once and reuse it for every collection, rather than letting
+            # each collection re-embed the same text
+            if query_embedding is None:
+                query_embedding = self.embed_query(query_text)
+
+            # Search the selected collections concurrently
+            futures = [
+                self.query_executor.submit(self._query_collection_by_embedding, collection_name, collection, query_embedding, k, where, ids)
+                for collection_name, collection in targets
+            ]
+            results = []
+            for future in futures:
+                results.extend(future.result())
+
+            # Keep the top k by score (ascending, as lower distance is better for similarity)
+            return heapq.nsmallest(k, results, key=lambda x: x["score"])
+
+    def _search_lexical(self, query_text, k, collections, ids=None):
+        """
+        Runs a timed BM25 search of the lexical index.
+        """
+        with metrics.span("lexical_search", k=k):
+            return self.lexical_index.search(query_text, k, collections=collections, ids=ids)
+
+    def query_hybrid(self, query_text, k=5, collections=None, query_embedding=None, where=None, candidates=None, rrf_k=60, lexical_weight=None, ids=None):
+        """
+        Retrieves the top k chunks by fusing vector and BM25 results with reciprocal rank fusion.
+
+        Each list contributes weight / (rrf_k + rank) for every chunk it ranks, so a chunk that is an
+        exact lexical match for an identifier, or a close semantic match, reaches the top without the
+        two scores having to be comparable. Queries containing identifiers such as RFP or section
+        numbers weight the lexical list double by default, since dense embeddings barely tell numbers
+        apart. Falls back to query_all_collections without a lexical index.
+
+        Args:
+            query_text (str): The query.
+            k (int): The number of documents to return.
+            collections (list, optional): Names of the cached collections to search, every cached collection when None.
+            query_embedding (list, optional): The query's embedding, if the caller already computed it.
+            where (dict, optional): A metadata where clause, also applied to the lexical hits.
+            ids (list, optional): Only return these chunks, from both lists.
+            candidates (int, optional): Results taken from each list before fusing. Defaults to 4 * k.
+            rrf_k (int): The rank offset of reciprocal rank fusion, larger values flatten the ranking.
+            lexical_weight (float, optional): The lexical list's weight against the vector list's 1.0.
+                                              Defaults to 2.0 for identifier queries and 1.0 otherwise.
+
+        Returns:
+            list: Result dicts in the shape returned by query_all_collections, plus "fused_score".
+                  "score" is the vector distance, None for chunks only the lexical index found.
+        """
+        if self.lexical_index is None:
+            return self.query_all_collections(query_text, k, collections=collections, query_embedding=query_embedding, where=where, ids=ids)
+        candidates = candidates or 4 * k
+        searched = list(self.cached_collections) if collections is None else [name for name in collections if name in self.cached_collections]
+        # The lexical search runs on the query pool while this thread fans the vector search out,
+        # only leaf tasks go to the pool so concurrent queries cannot starve it
+        lexical_future = self.query_executor.submit(self._search_lexical, query_text, candidates, searched, ids)
+        vector_hits = self.query_all_collections(query_text, candidates, collections=searched, query_embedding=query_embedding, where=where, ids=ids)
+        lexical_hits = lexical_future.result()
+
+        if lexical_weight is None:
+            lexical_weight = 2.0 if Lexical_Index.identifiers(query_text) else 1.0
+        fused = {}
+        for ranking, weight in ((vector_hits, 1.0), (lexical_hits, lexical_weight)):
+            for rank, hit in enumerate(ranking):
+                fused[hit["id"]] = fused.get(hit["id"], 0.0) + weight / (rrf_k + rank + 1)
+        results = {hit["id"]: hit for hit in vector_hits}
+
+        # Lexical-only hits still need their text and metadata, and must pass the same filter
+        missing = {}
+        for hit in lexical_hits:
+            if hit["id"] not in results:
+                missing.setdefault(hit["collection"], []).append(hit["id"])
+        for collection_name, ids in missing.items():
+            filters = {"where": where} if where else {}
+            try:
+                with metrics.span("chroma_get", collection=collection_name, ids=len(ids)):
+                    found = self.cached_collections[collection_name].get(ids=ids, include=["documents", "metadatas"], **filters)
             except Exception as e:
-                print(f"Error querying collection '{collection_name}': {e}")
+                print(f"Error fetching lexical hits from collection '{collection_name}': {e}")
+                continue
+            for chunk_id, document, metadata in zip(found["ids"], found["documents"], found["metadatas"]):
+                results[chunk_id] = {"collection": collection_name, "document": document, "metadata": metadata, "id": chunk_id, "score": None}
 
-        # Sort results by score (ascending, as lower distance is better for similarity)
-        results = sorted(results, key=lambda x: x["score"])
-        return results[:k]        
\ No newline at end of file
+        top = heapq.nlargest(k, (chunk_id for chunk_id in fused if chunk_id in results), key=lambda chunk_id: fused[chunk_id])
+        return [dict(results[chunk_id], fused_score=fused[chunk_id]) for chunk_id in top]
@@ -1,16 +1,73 @@
-import torch
-from transformers import pipeline
+import gc
+import sys
+import numpy as np
+from classes.util import Util
+from classes.token_batcher import Token_Batcher
+from classes.metrics import metrics
+
+# "nli" runs every (chunk, category) pair through the zero-shot NLI model,
+# "embedding" scores chunk embeddings against per-category prototype vectors
+MODES = ("nli", "embedding")
 
 class Zero_Shot_Classifier:
-    def __init__(self, classes, random_seed=42):
+    def __init__(self, classes, random_seed=42, model_name="MoritzLaurer/deberta-v3-large-zeroshot-v2.0", cache=None,
+                 mode="nli", embedding_function=None, label_descriptions=None, seed_examples=None, temperature=0.05,
+                 token_budget=4096, max_batch_size=32):
         """
         Initializes the zero-shot classifier with a fixed random seed for consistency.
 
         Args:
             classes (list): List of possible classification labels.
             random_seed (int): Random seed for reproducibility (default=42).
-            device (int): Determines whether to run on CPU or GPU
+            model_name (str): The Hugging Face zero-shot classification model to load in "nli" mode.
+            cache (Classification_Cache, optional): Persistent cache of previous results, skipped when None.
+            mode (str): "nli" for the zero-shot NLI model, or "embedding" to compare chunk embeddings
+                        against category prototypes, which needs no model beyond the embedding function.
+            embedding_function (callable, optional): Embedding function used in "embedding" mode,
+                                                     normally the Vector_Store's so chunks are embedded once.
+            label_descriptions (dict, optional): Maps each label to a description (or list of descriptions)
+                                                 used to build its prototype. Defaults to the label name.
+            seed_examples (dict, optional): Maps each label to example texts that are averaged into its prototype.
+            temperature (float): Softmax temperature applied to cosine similarities in "embedding" mode.
+            token_budget (int): Maximum padded tokens per NLI forward batch, counting one row per (chunk, label) pair.
+            max_batch_size (int): Maximum chunks per NLI forward batch.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown classifier mode '{mode}', expected one of {MODES}")
+        self.hypothesis_template = "This text is about {}"
+        self.classes = classes
+        self.model_name = model_name
+        self.cache = cache
+        self.mode = mode
+        self.model = None
+
+        if mode == "embedding":
+            if embedding_function is None:
+                raise ValueError("An embedding_function is required in embedding mode")
+            self.embedding_function = embedding_function
+            self.temperature = temperature
+            self.prototypes = self.build_prototypes(label_descriptions or {}, seed_examples or {})
+            # Identifies the embedding model and prototype inputs, so cached results never outlive them
+            embedding_model_name = getattr(embedding_function, "MODEL_NAME", type(embedding_function).__name__)
+            self.model_id = f"embedding:{embedding_model_name}:{Util.generate_hash(repr((label_descriptions, seed_examples, temperature)))[:16]}"
+            print("Classifier initialized in embedding mode")
+            return
+
+        self.model_id = model_name
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        # The NLI model is loaded on first use, so torch is never imported unless something is classified
+        print("Classifier initialized")
+
+    def load(self):
         """
+        Loads the zero-shot NLI model if it is not already resident. Called automatically on first use.
+        """
+        if self.model is not None:
+            return
+        import torch
+        from transformers import pipeline
+
         # 1. Check for GPU availability using PyTorch
         if torch.cuda.is_available():
             # Use the specified device (defaulting to 'cuda:0')
@@ -18,17 +75,82 @@ class Zero_Shot_Classifier:
         else:
             # Fallback to CPU
             device = -1
-        self.hypothesis_template = "This text is about {}"
-        self.classes = classes
 
         # Load the zero-shot classification model
-        self.model = pipeline(
-            "zero-shot-classification", 
-            model="MoritzLaurer/deberta-v3-large-zeroshot-v2.0", 
-            device=device
-        )
-        print("Classifier initialized")
-    
+        print(f"Loading classifier model {self.model_name}...")
+        with metrics.span("model_load", model=self.model_name):
+            self.model = pipeline(
+                "zero-shot-classification", 
+                model=self.model_name, 
+                device=device
+            )
+        self.batcher = Token_Batcher(self.model.tokenizer, token_budget=self.token_budget, max_batch_size=self.max_batch_size)
+        # Every (chunk, label) row also carries the hypothesis sentence
+        self.hypothesis_tokens = max(self.batcher.token_lengths([self.hypothesis_template.format(label) for label in self.classes]))
+
+    def unload(self):
+        """
+        Releases the NLI model so its memory is returned once ingestion is finished. It is reloaded on next use.
+        """
+        if self.model is None:
+            return
+        self.model = None
+        self.batcher = None
+        gc.collect()
+        # Only touch torch if it was imported to load the model
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        print(f"Unloaded classifier model {self.model_name}")
+
+    def build_prototypes(self, label_descriptions, seed_examples):
+        """
+        Builds one unit-length prototype vector per class from its descriptions and seed examples.
+
+        Args:
+            label_descriptions (dict): Maps each label to a description or list of descriptions.
+            seed_examples (dict): Maps each label to a list of example texts.
+
+        Returns:
+            np.ndarray: A (classes x dimensions) float32 matrix of normalized prototypes.
+        """
+        prototypes = []
+        for label in self.classes:
+            descriptions = label_descriptions.get(label, label.replace("_", " "))
+            if isinstance(descriptions, str):
+                descriptions = [descriptions]
+            texts = [self.hypothesis_template.format(description) for description in descriptions]
+            texts.extend(seed_examples.get(label, []))
+
+            vectors = self._normalize(np.asarray(self.embedding_function(texts), dtype=np.float32))
+            prototypes.append(vectors.mean(axis=0))
+        return self._normalize(np.vstack(prototypes))
+
+    @staticmethod
+    def _normalize(vectors):
+        """
+        Scales each row of a matrix to unit length, leaving zero rows untouched.
+        """
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def score_embeddings(self, embeddings):
+        """
+        Scores embeddings against the class prototypes.
+
+        Args:
+            embeddings (list or np.ndarray): One embedding per text.
+
+        Returns:
+            np.ndarray: A (texts x classes) matrix of softmax probabilities over cosine similarities.
+        """
+        similarities = self._normalize(np.asarray(embeddings, dtype=np.float32)) @ self.prototypes.T
+        logits = similarities / self.temperature
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
     def classify(self, text):
         """
         Classifies the input text using zero-shot classification.
@@ -42,7 +164,17 @@ class Zero_Shot_Classifier:
         # Clean the input text
         text = text.strip()
 
+        if self.mode == "embedding":
+            scores = self.score_embeddings(self.embedding_function([text]))[0]
+            order = np.argsort(-scores)
+            return {
+                "sequence": text,
+                "labels": [self.classes[i] for i in order],
+                "scores": [float(scores[i]) for i in order]
+            }
+
         # Perform classification
+        self.load()
         return self.model(
             text, 
             self.classes, 
@@ -50,18 +182,76 @@ class Zero_Shot_Classifier:
             multi_label=False
         )
 
-    def classify_bulk(self, chunks):
+    def classify_bulk(self, chunks, chunk_hashes=None, embeddings=None):
         """
         Classifies multiple chunks of text at once.
 
+        When a cache is configured, chunks whose hash was already classified with the same model,
+        categories and hypothesis template are answered from the cache and never reach the model.
+
+        Args:
+            chunks (list): A list of text chunks to classify.
+            chunk_hashes (list, optional): SHA-256 hashes of the chunks, computed here if not provided.
+            embeddings (list, optional): Precomputed chunk embeddings, used in "embedding" mode
+                                         instead of embedding the chunks again.
+
+        Returns:
+            list: A list of tuples containing the best classification label and score for each chunk.
+        """
+        if self.cache is None:
+            with metrics.span("classify", mode=self.mode, chunks=len(chunks)):
+                return self._classify_uncached(chunks, embeddings)
+
+        if chunk_hashes is None:
+            chunk_hashes = [Util.generate_hash(chunk) for chunk in chunks]
+        context = self.cache.context_key(self.model_id, self.classes, self.hypothesis_template)
+        cached = self.cache.get_many(chunk_hashes, context)
+
+        # Only send each uncached hash through the model once
+        missing = {}
+        for i, chunk_hash in enumerate(chunk_hashes):
+            if chunk_hash not in cached and chunk_hash not in missing:
+                missing[chunk_hash] = i
+
+        metrics.increment("classification_cache_hits", len(chunk_hashes) - len(missing))
+        if missing:
+            indexes = list(missing.values())
+            missing_embeddings = None if embeddings is None else [embeddings[i] for i in indexes]
+            with metrics.span("classify", mode=self.mode, chunks=len(indexes)):
+                computed = dict(zip(missing.keys(), self._classify_uncached([chunks[i] for i in indexes], missing_embeddings)))
+            self.cache.put_many(computed, context)
+            cached.update(computed)
+
+        return [cached[chunk_hash] for chunk_hash in chunk_hashes]
+
+    def _classify_uncached(self, chunks, embeddings=None):
+        """
+        Runs the zero-shot model, or the prototype comparison in "embedding" mode, over the chunks.
+
         Args:
             chunks (list): A list of text chunks to classify.
+            embeddings (list, optional): Precomputed chunk embeddings for "embedding" mode.
 
         Returns:
             list: A list of tuples containing the best classification label and score for each chunk.
         """
-        # Perform batch classification
-        results = self.model(chunks, self.classes, hypothesis_template=self.hypothesis_template)
+        if self.mode == "embedding":
+            if not chunks:
+                return []
+            if embeddings is None:
+                embeddings = self.embedding_function(chunks)
+            scores = self.score_embeddings(embeddings)
+            best = scores.argmax(axis=1)
+            return [(self.classes[index], float(scores[row, index])) for row, index in enumerate(best)]
+
+        # Perform batch classification in length-sorted, token-budgeted batches
+        self.load()
+        results = self.batcher.run(
+            chunks,
+            self._run_nli_batch,
+            rows_per_text=len(self.classes),
+            extra_tokens=self.hypothesis_tokens
+        )
 
         classifications = []
         for output in results:
@@ -69,4 +259,25 @@ class Zero_Shot_Classifier:
             best_score = output['scores'][0]
             classifications.append((best_class, best_score))
 
-        return classifications
\ No newline at end of file
+        return classifications
+
+    def _run_nli_batch(self, batch):
+        """
+        Runs one planned batch through the zero-shot pipeline as a single forward batch.
+
+        Args:
+            batch (list): The chunks in this batch.
+
+        Returns:
+            list: The pipeline output dict for each chunk.
+        """
+        results = self.model(
+            batch,
+            self.classes,
+            hypothesis_template=self.hypothesis_template,
+            batch_size=len(batch) * len(self.classes)
+        )
+        if isinstance(results, dict):
+            # The pipeline unwraps single-item batches
+            results = [results]
+        return results
@@ -1,18 +1,72 @@
 import re
 from classes.util import Util
 from classes.pdf_parser import PDF_Parser
-from classes.llm import LLM
+from classes.llm import LLM, Think_Filter
 from classes.zero_shot_classifier import Zero_Shot_Classifier
 from classes.vector_store import Vector_Store
+from classes.numpy_vector_store import Numpy_Vector_Store
 from classes.summarizer import Summarizer
-from collections import defaultdict
+from classes.ingest_pipeline import Ingest_Pipeline
+from classes.classification_cache import Classification_Cache
+from classes.document_manifest import Document_Manifest
+from classes.text_cache import Text_Cache
+from classes.prompt_builder import Prompt_Builder
+from classes.answer_cache import Answer_Cache
+from classes.query_router import Query_Router
+from classes.lexical_index import Lexical_Index
+from classes.page_index import Page_Index
+from classes.metrics import metrics
+import argparse
+import functools
+import os
 import time
 
 #CONSTANTS
 model_name = "qwen3:8b"
+# None uses the OLLAMA_HOST environment variable, or the local Ollama server
+ollama_base_url = None
 vector_store_local_path = r"C:\Users\kbren\source\repos\RAG - Work\vector_store"
 pdf_location = r"C:\Users\kbren\source\repos\RAG - Work\attachments\RFI_32701-25-261_Parks_Reservation_System.pdf"
 pdf_metadata = "DEC_Parks_Reservation_System.pdf"
+classification_cache_path = os.path.join(vector_store_local_path, "classification_cache.sqlite3")
+manifest_path = os.path.join(vector_store_local_path, "document_manifest.json")
+text_cache_path = os.path.join(vector_store_local_path, "text_cache.sqlite3")
+answer_cache_path = os.path.join(vector_store_local_path, "answer_cache.sqlite3")
+embedding_cache_path = os.path.join(vector_store_local_path, "embedding_cache")
+lexical_index_path = os.path.join(vector_store_local_path, "lexical_index.sqlite3")
+# Fuse BM25 keyword hits with the vector hits, so exact identifiers (RFP numbers, sections, dates) are found
+hybrid_retrieval = True
+# Find the nearest pages first and search only their chunks, once more than coarse_pages pages are indexed
+two_level_retrieval = True
+# Pages kept by the coarse search, more pages raise recall at the cost of a larger chunk search
+coarse_pages = 20
+# Search only the collections whose category the query matches, scored against the category descriptions.
+# None routes only when classifier_mode is "embedding", so queries are routed by the same scorer that filed
+# the chunks. Set True with "nli" only once benchmarks/classifier_agreement.py shows the two modes agree
+query_routing = None
+# Probability a category needs to be searched
+routing_min_probability = 0.2
+# Below this top-category probability the query is treated as ambiguous and every collection is searched
+routing_confidence = 0.5
+# "chroma" stores chunks in Chroma, "numpy" in memory-mapped arrays searched exactly (see classes/numpy_vector_store.py)
+vector_store_backend = "chroma"
+numpy_index_path = os.path.join(vector_store_local_path, "numpy_index")
+# numpy backend only: scan int8-quantized embeddings and rescore the best candidates in float32
+numpy_quantize = False
+# Written when metrics are enabled with --metrics: one JSON line per timed stage, and a Prometheus text dump on exit
+metrics_log_path = os.path.join(vector_store_local_path, "metrics.jsonl")
+metrics_prometheus_path = os.path.join(vector_store_local_path, "metrics.prom")
+summarize_chunks = False
+# "tokens" sizes chunks with the embedding model's tokenizer so no chunk is truncated when embedded,
+# "characters" uses the original character-count chunker with chunk_size
+chunker = "tokens"
+chunk_size = 300
+# Tokens per chunk for the "tokens" chunker, None fills the embedding model's window
+chunk_token_budget = None
+# Tokens repeated from the end of each chunk at the start of the next
+chunk_overlap_tokens = 0
+# Approximate tokens of retrieved context allowed in each synthesis prompt
+context_token_budget = 2048
 
 categories = [
     "Scope_of_Work",
@@ -20,200 +74,454 @@ categories = [
     "Technical_Documentation"
 ]
 
+# "nli" uses the deberta zero-shot model, "embedding" compares chunk embeddings against category prototypes
+classifier_mode = "nli"
+# Descriptions used to build the category prototypes in embedding mode
+category_descriptions = {
+    "Scope_of_Work": "the scope of work, services and deliverables the contractor must provide",
+    "Requirements": "mandatory requirements, qualifications, submission instructions and evaluation criteria",
+    "Technical_Documentation": "technical specifications, system architecture, software and infrastructure details"
+}
+
+def resolve_chunking(store):
+    """
+    Picks the chunking method and size for a vector store's embedding model, falling back to character
+    chunking when its tokenizer is unavailable. init() resolves it once, so the fallback is reported once.
+
+    Args:
+        store (Vector_Store): The vector store whose embedding model the chunks must fit.
+
+    Returns:
+        tuple: ("tokens", token budget, tokenizer) or ("characters", chunk_size, None).
+    """
+    if chunker == "tokens":
+        tokenizer, max_tokens = store.get_tokenizer()
+        if tokenizer is not None:
+            return "tokens", min(chunk_token_budget or max_tokens, max_tokens), tokenizer
+        print("Falling back to character chunking")
+    return "characters", chunk_size, None
+
+def chunk_page(page_text, size, tokenizer=None):
+    """
+    Chunks one page, by tokens when given the tokenizer from resolve_chunking and by characters otherwise.
+    Used by the ingest pipeline and the benchmarks, so both produce the same chunks.
+    """
+    if tokenizer is not None:
+        return Util.chunk_tokens(page_text, tokenizer, size, overlap_tokens=chunk_overlap_tokens)
+    return Util.chunk_intelligent(page_text, max_chunk_size=size)
+
+
 #initialize classes 
+# Built by init() rather than at import, so worker processes started with the spawn method (which
+# re-import this module) never open a second vector store, the caches or any model.
+# The classifier and summarizer load their models on first use, so a query-only run never imports torch
+util = None
+pdf_parser = None
+classification_cache = None
+vector_store = None
+zero_shot_classifier = None
+document_manifest = None
+query_llm = None
+prompt_builder = None
+answer_cache = None
+summarizer = None
+page_index = None
+query_router = None
+ingest_pipeline = None
+# (method, size, tokenizer) from resolve_chunking
+chunking = None
 
-util = Util()
-pdf_parser = PDF_Parser()
-zero_shot_classifier = Zero_Shot_Classifier(categories)
-vector_store = Vector_Store(vector_store_local_path)
-#Attempt to (re)create and cache the collections
-vector_store.delete_collections(categories)
-vector_store.create_collections(categories)
-vector_store.cache_collections(categories)
-query_llm = LLM(model_name=model_name)
-summarizer = Summarizer()
+def init():
+    """
+    Builds the shared components from the constants above. Calling it again does nothing.
+    """
+    global util, pdf_parser, classification_cache, vector_store, zero_shot_classifier, document_manifest, query_llm, prompt_builder, answer_cache, summarizer, page_index, query_router, ingest_pipeline, chunking
+    if vector_store is not None:
+        return
+    util = Util()
+    pdf_parser = PDF_Parser(text_cache=Text_Cache(text_cache_path))
+    classification_cache = Classification_Cache(classification_cache_path)
+    vector_store_options = {
+        "embedding_cache_path": embedding_cache_path,
+        "lexical_index_path": lexical_index_path if hybrid_retrieval else None
+    }
+    if vector_store_backend == "numpy":
+        vector_store = Numpy_Vector_Store(numpy_index_path, quantize=numpy_quantize, **vector_store_options)
+    else:
+        vector_store = Vector_Store(vector_store_local_path, **vector_store_options)
+    zero_shot_classifier = Zero_Shot_Classifier(
+        categories,
+        cache=classification_cache,
+        mode=classifier_mode,
+        embedding_function=vector_store.embedding_function,
+        label_descriptions=category_descriptions
+    )
+    document_manifest = Document_Manifest(manifest_path)
+    query_llm = LLM(model_name=model_name, base_url=ollama_base_url)
+    prompt_builder = Prompt_Builder(context_token_budget=context_token_budget)
+    answer_cache = Answer_Cache(answer_cache_path)
+    # Cached answers built on a chunk are dropped whenever that chunk is re-indexed or deleted
+    vector_store.add_change_listener(answer_cache.invalidate_chunks)
+    summarizer = Summarizer()
+    page_index = Page_Index(vector_store) if two_level_retrieval else None
+    query_router = None
+    if query_routing or (query_routing is None and classifier_mode == "embedding"):
+        # Routing needs category prototypes, reuse the classifier's when it already has them
+        routing_scorer = zero_shot_classifier if classifier_mode == "embedding" else Zero_Shot_Classifier(
+            categories,
+            mode="embedding",
+            embedding_function=vector_store.embedding_function,
+            label_descriptions=category_descriptions
+        )
+        query_router = Query_Router(routing_scorer, categories, min_probability=routing_min_probability, confidence=routing_confidence)
+    chunking = resolve_chunking(vector_store)
+    ingest_pipeline = Ingest_Pipeline(util, vector_store, zero_shot_classifier, summarizer, chunker=functools.partial(chunk_page, tokenizer=chunking[2]))
 
 def add_text_to_vector_store_page_metadata(parsed_pages_data, source="", summarize=False, chunk_size=300):
     """
     Processes parsed PDF pages (with page numbers) for addition to the vector store.
 
+    Pages are streamed through the ingest pipeline in micro-batches, so each batch of chunks
+    becomes searchable as soon as it is classified instead of after the whole document.
+
     Args:
-        parsed_pages_data (list[tuple[int, str]]): A list of tuples (page_number, page_text).
+        parsed_pages_data (iterable[tuple[int, str]]): (page_number, page_text) pairs, either a list or a generator.
         source (str): The source identifier for the document (e.g., filename).
         summarize (bool): Whether to summarize chunks before adding them.
-        chunk_size (int): The size of chunks for text splitting.
+        chunk_size (int): The size of chunks for text splitting, in tokens or characters depending on the chunker.
+
+    Returns:
+        dict: The pipeline statistics, including the IDs of every chunk the document produced.
     """
-    
-    # 1. Generate all chunks with their associated page numbers and unique IDs
-    print(f"Chunking {source} pages and preparing for processing...")
-    all_raw_chunks_with_info = []
-    
-    for page_number, page_content in parsed_pages_data:
-        if page_content and page_content.strip(): # Only process pages that have actual content
-            page_chunks = util.chunk_intelligent(page_content, max_chunk_size=chunk_size)
-            for chunk_text in page_chunks:
-                # Store the raw chunk, its page number, and a hash for de-duplication
-                all_raw_chunks_with_info.append({
-                    "raw_chunk": chunk_text,
-                    "page_number": page_number,
-                    "id": util.generate_hash(chunk_text) # Hash of the raw chunk
-                })
-
-    if not all_raw_chunks_with_info:
+    print(f"Streaming {source} pages through the ingest pipeline...")
+    stats = ingest_pipeline.run(parsed_pages_data, source=source, summarize=summarize, chunk_size=chunk_size)
+
+    if not stats["chunks"]:
         print(f"No extractable text chunks found in {source}. Skipping vector store addition.")
-        return
+        return stats
 
-    # Extract all IDs to check against the vector store
-    all_chunk_ids = [item["id"] for item in all_raw_chunks_with_info]
-    
-    # 2. Check which documents already exist in the vector store
-    print(f"Checking for existing {source} chunks in vector store...")
-    existing_document_ids = set()
-    for category in categories: # Check all categories
-        query_results = vector_store.get_collection(category).get(ids=all_chunk_ids, include=['metadatas'])
-        for i, existing_id in enumerate(query_results.get('ids', [])):
-            existing_document_ids.add(existing_id)
-
-    chunks_to_process = [] # Will contain {raw_chunk, page_number, id} for new chunks
-    for item in all_raw_chunks_with_info:
-        if item["id"] not in existing_document_ids:
-            chunks_to_process.append(item)
-    
-    if not chunks_to_process:
+    if not stats["added"]:
         print(f"All chunks from {source} already exist in the vector store. Skipping further processing.")
+        return stats
+
+    for classification_key, count in stats["added"].items():
+        print(f"Added {count} documents to collection '{classification_key}'.")
+
+    print(f"Finished processing {source} into vector store")
+    return stats
+
+def indexing_settings():
+    """
+    Returns the settings that determine which chunks a document produces and where they end up.
+    A document indexed under different settings is re-indexed even if its file is unchanged.
+    """
+    chunk_method, chunk_length, _ = chunking
+    return {
+        "classifier_model": zero_shot_classifier.model_id,
+        "categories": categories,
+        "hypothesis_template": zero_shot_classifier.hypothesis_template,
+        "pdf_backend": pdf_parser.backend,
+        "embedding_model": vector_store.embedding_model_name,
+        "vector_store_backend": vector_store_backend,
+        "lexical_index": hybrid_retrieval,
+        # Page vectors record their chunk IDs, older page indexes without them are rebuilt
+        "page_index": "chunk_ids" if two_level_retrieval else False,
+        "chunker": chunk_method,
+        "chunk_size": chunk_length,
+        "chunk_overlap_tokens": chunk_overlap_tokens,
+        "summarize": summarize_chunks
+    }
+
+def index_document(document_location, source):
+    """
+    Indexes a document unless the manifest shows it is already up to date.
+
+    Unchanged documents are skipped without being parsed. Changed documents are re-indexed
+    incrementally: chunks that still exist are deduplicated by ID, and chunks the new version no
+    longer produces are removed, unless another indexed document still references them.
+
+    Args:
+        document_location (str): The path to the PDF file.
+        source (str): The source identifier stored in chunk metadata.
+    """
+    content_hash = util.generate_file_hash(document_location)
+    settings = indexing_settings()
+    if document_manifest.is_current(source, content_hash, settings):
+        print(f"{source} is unchanged since it was last indexed. Skipping.")
         return
 
-    print(f"Found {len(chunks_to_process)} new chunks to process.")
+    previous = document_manifest.get(source)
+    shared_ids = document_manifest.referenced_ids(exclude_source=source)
+    if previous is not None and previous["settings"] != settings:
+        # Chunks indexed under other settings would be deduplicated away, so drop them first
+        print(f"Indexing settings changed for {source}, removing its previous chunks...")
+        vector_store.delete_documents([chunk_id for chunk_id in previous["chunk_ids"] if chunk_id not in shared_ids])
+        previous = None
 
-    # Separate raw chunks, their IDs, and page numbers for bulk operations
-    raw_chunks_for_processing = [item["raw_chunk"] for item in chunks_to_process]
-    ids_for_processing = [item["id"] for item in chunks_to_process]
-    page_numbers_for_processing = [item["page_number"] for item in chunks_to_process] # Crucial: maintain order
+    print(f"Parsing {source}...")
+    try:
+        # Pages are streamed straight into the ingest pipeline as they are extracted
+        document_pages = pdf_parser.iter_pages_parallel(document_location, content_hash=content_hash)
+        with metrics.span("index_document", source=source) as span:
+            stats = add_text_to_vector_store_page_metadata(parsed_pages_data=document_pages, source=source, summarize=summarize_chunks, chunk_size=settings["chunk_size"])
+            span.set(chunks=stats["chunks"])
+    except Exception as e:
+        # Leave the manifest untouched so the document is retried on the next run
+        print(f"Error indexing {source}: {e}")
+        return
 
-    # 3. Summarize chunks if requested
-    if summarize:
-        print("Summarizing new chunks...")
-        # Assuming bulk_summarize maintains the order of texts
-        processed_chunks = summarizer.bulk_summarize(texts=raw_chunks_for_processing, batch_size=len(raw_chunks_for_processing))
-    else:
-        print("Skipping summarization for new chunks...")
-        processed_chunks = raw_chunks_for_processing
-            
-    # 4. Classify chunks
-    print("Classifying new chunks...")
-    # Assuming classify_bulk maintains the order of texts
-    classifications = zero_shot_classifier.classify_bulk(processed_chunks)
-    
-    # 5. Build metadata array, including page number
-    print("Building metadata for new chunks...")
-    metadata_array = [] 
-    for i, classification_result in enumerate(classifications):
-        # The order of classification_result, processed_chunks, ids_for_processing,
-        # and page_numbers_for_processing must all align due to their sequential processing.
-        metadata_array.append({
-            "source": source,
-            "classification": classification_result[0], # The predicted category name
-            "confidence": classification_result[1],    # The confidence score
-            "page_number": page_numbers_for_processing[i] # Page number from the document
-        })
-
-    # 6. Group documents by classification using defaultdict for convenience
-    print("Grouping data by classification...")
-    sorted_by_classification = defaultdict(list)
-    
-    for i in range(len(processed_chunks)):
-        chunk = processed_chunks[i]
-        metadata = metadata_array[i]
-        hashed_id = ids_for_processing[i]
-        
-        classification = metadata["classification"]
-        
-        sorted_by_classification[classification].append({
-            "document": chunk,
-            "metadata": metadata,
-            "id": hashed_id
-        })
-
-    # 7. Add the data to our vector store 
-    print("Adding data to vector store...")    
-    for classification_key, arr in sorted_by_classification.items():
-        if arr: # Ensure there are documents to add for this classification
-            documents_to_add = [data["document"] for data in arr]
-            metadata_to_add = [data["metadata"] for data in arr]
-            ids_to_add = [data["id"] for data in arr]
-            
-            # Add the set of documents for this classification to the vector store
-            vector_store.add_documents(classification_key, documents_to_add, metadata_to_add, ids_to_add)
-            print(f"Added {len(documents_to_add)} documents to collection '{classification_key}'.")
-            
-    print(f"Finished processing {source} into vector store")
+    if previous is not None:
+        current_ids = set(stats["chunk_ids"])
+        stale_ids = [chunk_id for chunk_id in previous["chunk_ids"] if chunk_id not in current_ids and chunk_id not in shared_ids]
+        if stale_ids:
+            print(f"Removing {len(stale_ids)} stale chunks from the previous version of {source}...")
+            vector_store.delete_documents(stale_ids)
 
-def build_sythesis_prompt(user_query, context):      
-    rag_prompt = """
-You are an AI assistant integrated into a Retrieval-Augmented Generation (RAG) system. Your primary function is to
-synthesize responses to user questions by combining both retrieved information and your own knowledge, adhering to
-specific guidelines.
-
-**Guidelines for Response:**
-
-1. **Primary Source - Retrieved Information:**
-    - Base your response first on the retrieved information, which serves as your primary source. 
-
-2. **Supplement with Personal Knowledge When Necessary:**
-    - If the retrieved information is insufficient, use your own knowledge to fill in gaps.
-    - Clearly state when personal knowledge is used, ensuring a comprehensive response.
-
-3. **Clarity and Attribution:**
-    - Distinguish between information derived from retrieval sources and your own knowledge.
-    - Cite any retrieved information if applicable
-    - Highlight page numbers that data can be found on for user verification
-
-4. **Neutral and Informative Tone:**
-    - Maintain a neutral tone, avoiding assumptions beyond the available information.
-
-5. **Use of Personal Knowledge:**
-    - Apply personal knowledge only when necessary to ensure the response is thorough and accurate.
-"""
-    final_prompt = ""
-    # Include context first
-    for entry in context:
-        print(f"Context Selected:\n{entry["document"]}\nCategory: {entry["collection"]} - Source: {entry["metadata"]["source"]} - Page: {entry["metadata"]["page_number"]}\n")
-        # Append the document content and its metadata for the LLM to use
-        final_prompt =  final_prompt + entry["document"] + f"\n[Category: {entry["collection"]} - Source: {entry["metadata"]["source"]} - Page: {entry["metadata"]["page_number"]}]\n"
-    
-    # Then append the RAG instructions and the user query
-    final_prompt = final_prompt + rag_prompt + "\n\nUser Question:\n" + user_query
-    
-    return final_prompt
+    if page_index is not None:
+        page_index.update(source, stats["pages"])
+
+    document_manifest.record(source, content_hash, stats["chunk_ids"], settings)
+
+def build_sythesis_prompt(user_query, context):
+    """
+    Builds the synthesis prompt with the static RAG instructions first, so the Ollama server can reuse
+    the cached prefix across queries, followed by the budgeted, de-duplicated context and the question.
+
+    Args:
+        user_query (str): The user's question.
+        context (list): Retrieved results from the vector store, best first.
+
+    Returns:
+        str: The prompt to send to the LLM.
+    """
+    return prompt_builder.build(user_query, context)
+
+def answer_cache_key(user_query, context):
+    """
+    Builds the answer cache key from the query, the retrieved chunk IDs, the model and every
+    generation and prompt setting that can change the answer.
+    """
+    parameters = {
+        "temperature": query_llm.temperature,
+        "seed": query_llm.seed,
+        "instructions": util.generate_hash(prompt_builder.instructions),
+        "context_token_budget": prompt_builder.context_token_budget,
+        "duplicate_threshold": prompt_builder.duplicate_threshold
+    }
+    return answer_cache.make_key(user_query, [entry["id"] for entry in context], query_llm.model_name, parameters)
 
-def process_user_query(user_query, num_documents=3):
+def resolve_categories(values):
+    """
+    Maps category filter values to the category names, ignoring case.
+
+    Args:
+        values (str or list): One category or several.
+
+    Returns:
+        str or list: The matching category names, in the same shape as values.
+
+    Raises:
+        ValueError: If a value matches no category.
+    """
+    by_name = {category.lower(): category for category in categories}
+    names = [values] if isinstance(values, str) else list(values)
+    unknown = [name for name in names if name.lower() not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown categories {unknown}, expected one of {categories}")
+    resolved = [by_name[name.lower()] for name in names]
+    return resolved[0] if isinstance(values, str) else resolved
+
+def parse_query_filters(query):
+    """
+    Splits chat filter syntax off a query. Recognized terms, anywhere in the query:
+    source:NAME (quote names with spaces), pages:3-7 or page:5, category:NAME and confidence:0.8.
+
+    Args:
+        query (str): The raw chat input.
+
+    Returns:
+        tuple[str, dict]: The query without filter terms, and the filters as keyword arguments for Vector_Store.build_where.
+
+    Raises:
+        ValueError: If a filter value cannot be read or names an unknown category.
+    """
+    filters = {}
+    def take(match):
+        key, value = match.group(1).lower(), match.group(2).strip('"')
+        if key == "source":
+            filters.setdefault("source", []).append(value)
+        elif key in ("category", "classification"):
+            filters.setdefault("classification", []).append(value)
+        elif key in ("page", "pages"):
+            first, _, last = value.partition("-")
+            filters["pages"] = (int(first) if first else None, int(last) if last else None) if _ else (int(value), int(value))
+        else:
+            filters["min_confidence"] = float(value)
+        return ""
+    pattern = r'\b(source|category|classification|pages?|confidence):("[^"]*"|\S+)'
+    try:
+        cleaned = re.sub(pattern, take, query, flags=re.IGNORECASE)
+    except ValueError as e:
+        raise ValueError(f"Could not read the filters in '{query}': {e}")
+    for key in ("source", "classification"):
+        if key in filters and len(filters[key]) == 1:
+            filters[key] = filters[key][0]
+    if "classification" in filters:
+        filters["classification"] = resolve_categories(filters["classification"])
+    return " ".join(cleaned.split()), filters
+
+def retrieve_context(user_query, num_documents, filters=None):
+    """
+    Retrieves the top context chunks for a query, fusing in BM25 keyword hits when hybrid retrieval
+    is enabled. Unless the query carries filters or an identifier, the search is narrowed to the
+    collections the query router picks and to the chunks of the nearest pages in the page index,
+    widening back to everything when the narrowed search cannot fill the context. Filters are pushed
+    down to the vector store as a where clause, and a category filter picks the collections directly.
+
+    Args:
+        user_query (str): The user's question.
+        num_documents (int): The number of context chunks to retrieve.
+        filters (dict, optional): Keyword arguments for Vector_Store.build_where.
+
+    Returns:
+        list: Result dicts from Vector_Store.query_hybrid or Vector_Store.query_all_collections.
+
+    Raises:
+        ValueError: If the category filter names an unknown category.
+    """
+    filters = dict(filters or {})
+    if filters.get("classification") is not None:
+        # Collections are named after the categories, so an unmatched name would silently search nothing
+        filters["classification"] = resolve_categories(filters["classification"])
+    search = vector_store.query_hybrid if hybrid_retrieval else vector_store.query_all_collections
+    where = vector_store.build_where(**filters)
+    classification = filters.get("classification")
+    if classification is not None:
+        collections = [classification] if isinstance(classification, str) else list(classification)
+        return search(user_query, num_documents, collections=collections, where=where)
+    # A filtered search is already narrow, and an identifier says nothing about its category or
+    # its page's overall topic, so narrowing could only leave the matches out
+    if where is not None or (hybrid_retrieval and Lexical_Index.identifiers(user_query)):
+        return search(user_query, num_documents, where=where)
+    if query_router is None and page_index is None:
+        return search(user_query, num_documents)
+
+    query_embedding = vector_store.embed_query(user_query)
+    collections = query_router.route(query_embedding) if query_router is not None else None
+    page_chunk_ids = page_index.restrict(query_embedding, coarse_pages) if page_index is not None else None
+    start = time.perf_counter()
+    context = search(user_query, num_documents, collections=collections, query_embedding=query_embedding, ids=page_chunk_ids)
+    narrowed = page_chunk_ids is not None or (collections is not None and len(collections) < len(categories))
+    if len(context) < num_documents and narrowed:
+        # The narrowed search could not fill the context, widen to everything
+        print("Narrowed search returned too few results, searching all collections and pages")
+        collections = list(categories)
+        context = search(user_query, num_documents, query_embedding=query_embedding)
+    if query_router is not None:
+        query_router.record(len(collections), time.perf_counter() - start)
+    return context
+
+def process_user_query(user_query, num_documents=3, timings=None, filters=None):
     """
     Processes a user query by retrieving relevant context and generating a response,
-    resetting the LLM's conversation history before each call to ensure no context
-    from previous turns is used.
+    sending an empty conversation history with each call to ensure no context
+    from previous turns is used. Safe to call from several threads at once.
+
+    Args:
+        user_query (str): The user's question.
+        num_documents (int): The number of context chunks to retrieve.
+        timings (dict, optional): Filled with the seconds spent on "retrieval", "prompt" and
+                                  "generation", and whether the answer was "cached".
+        filters (dict, optional): Metadata filters for the retrieval, see parse_query_filters.
     """
-    
-    # 1. Reset the conversation history before every prompt
-    if hasattr(query_llm, 'set_messages'):
-        query_llm.set_messages([])
-    
-    # 2. Query all collections
-    context = vector_store.query_all_collections(user_query, num_documents)
+    if timings is None:
+        timings = {}
+
+    # 1. Query the routed collections
+    start = time.perf_counter()
+    context = retrieve_context(user_query, num_documents, filters)
+
+    # 2. Reuse the answer if this question was already asked against the same context
+    cache_key = answer_cache_key(user_query, context)
+    cached_output = answer_cache.get(cache_key)
+    timings["retrieval"] = time.perf_counter() - start
+    timings["cached"] = cached_output is not None
+    if cached_output is not None:
+        timings["prompt"] = timings["generation"] = 0.0
+        print("******************RAG OUTPUT (cached)******************")
+        print(cached_output)
+        return cached_output
     
     # 3. Build the prompt with RAG context and instructions
+    start = time.perf_counter()
     prompt = build_sythesis_prompt(user_query, context)
+    timings["prompt"] = time.perf_counter() - start
     
-    # 4. Get LLM response
-    llm_output = query_llm.prompt(prompt)
+    # 4. Get LLM response, with an empty history so no previous turn leaks in
+    start = time.perf_counter()
+    llm_output = query_llm.prompt(prompt, messages=[])
+    timings["generation"] = time.perf_counter() - start
     
-    # 5. Clean and print output
-    pattern = r"<think>(.*?)</think>"
-    cleaned_output = re.sub(pattern, "", llm_output, flags=re.DOTALL)
+    # 5. Clean and print output, an unterminated think block leaves no answer and nothing worth caching
+    cleaned_output = Think_Filter.remove(llm_output).strip()
+    if cleaned_output:
+        answer_cache.put(cache_key, user_query, cleaned_output, [entry["id"] for entry in context])
     
     print("******************RAG OUTPUT******************")
-    print(cleaned_output.strip())
+    print(cleaned_output)
     
-    return cleaned_output.strip()
+    return cleaned_output
+
+def process_user_query_stream(user_query, num_documents=3, filters=None):
+    """
+    Streaming variant of process_user_query. Retrieves context, builds the same prompt and yields
+    the response as it is generated, with <think> sections filtered out on the fly.
+
+    Args:
+        user_query (str): The user's question.
+        num_documents (int): The number of context chunks to retrieve.
+        filters (dict, optional): Metadata filters for the retrieval, see parse_query_filters.
+
+    Yields:
+        str: Visible pieces of the response, in order.
+    """
+    # 1. Query the routed collections
+    context = retrieve_context(user_query, num_documents, filters)
+
+    # 2. Reuse the answer if this question was already asked against the same context
+    cache_key = answer_cache_key(user_query, context)
+    cached_output = answer_cache.get(cache_key)
+    if cached_output is not None:
+        yield cached_output
+        return
+
+    # 3. Build the prompt with RAG context and instructions
+    prompt = build_sythesis_prompt(user_query, context)
+
+    # 4. Stream the LLM response with an empty history, dropping the think section and its trailing whitespace
+    think_filter = Think_Filter()
+    started = False
+    pieces = []
+    for chunk in query_llm.stream(prompt, messages=[]):
+        visible = think_filter.feed(chunk)
+        if not started:
+            visible = visible.lstrip()
+            started = bool(visible)
+        if visible:
+            pieces.append(visible)
+            yield visible
+    remaining = think_filter.flush()
+    if not started:
+        remaining = remaining.lstrip()
+    if remaining:
+        pieces.append(remaining.rstrip())
+        yield remaining.rstrip()
+
+    # Only reached when the whole answer was streamed, so partial answers are never cached,
+    # and a stream that ended inside its think block leaves no answer to cache
+    answer = "".join(pieces).strip()
+    if answer:
+        answer_cache.put(cache_key, user_query, answer, [entry["id"] for entry in context])
 
 def interactive_chat():
     """
@@ -221,10 +529,10 @@ def interactive_chat():
     """
     print("\n******************INTERACTIVE RAG CHAT START (Stateless)******************")
     print("Enter your query or type 'exit' or 'quit' to end the session.")
+    print("Scope a query with source:NAME, pages:3-7, category:NAME or confidence:0.8 anywhere in it.")
     print("************************************************************************")
     
     while True:
-        start_time = time.time()
         try:
             user_input = input("USER QUERY: ")
         except EOFError:
@@ -242,26 +550,92 @@ def interactive_chat():
             continue
 
         try:
-            response = process_user_query(
+            query, filters = parse_query_filters(query)
+        except ValueError as e:
+            print(e)
+            continue
+        if filters:
+            print(f"Filters: {filters}")
+        if not query:
+            print("Enter a question along with the filters.")
+            continue
+
+        # Time from submitting the query, not from showing the prompt
+        start_time = time.time()
+        first_token_time = None
+        try:
+            print("******************RAG OUTPUT******************")
+            for token in process_user_query_stream(
                 user_query=query, 
-                num_documents=3
-            )
+                num_documents=3,
+                filters=filters
+            ):
+                if first_token_time is None:
+                    first_token_time = time.time()
+                print(token, end="", flush=True)
+            print()
         except Exception as e:
             print(f"An error occurred during processing: {e}")
         end_time = time.time()
         # Calculate the time taken
         elapsed_time = end_time - start_time
+        if first_token_time is not None:
+            print(f"Time to First Token: {first_token_time - start_time:.2f} seconds")
         print(f"Total Elapsed Time: {elapsed_time:.2f} seconds")
         print("************************************************************************\n")
 
 
 #############################MAIN START#############################
-print("Parsing document...")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index RFP documents and start the interactive RAG chat.")
+    parser.add_argument("--rebuild", action="store_true", help="Delete every collection and re-index all documents from scratch.")
+    parser.add_argument("--query-only", action="store_true", help="Skip indexing and serve queries from the existing vector store without loading any local models.")
+    parser.add_argument("--metrics", action="store_true", help="Record per-stage timings and counters to metrics.jsonl and metrics.prom next to the vector store.")
+    parser.add_argument("--metrics-port", type=int, help="Also serve the metrics in Prometheus format at http://127.0.0.1:PORT/metrics.")
+    args = parser.parse_args()
+    init()
+
+    if args.metrics or args.metrics_port:
+        os.makedirs(vector_store_local_path, exist_ok=True)
+        metrics.enable(json_log_path=metrics_log_path)
+        if args.metrics_port:
+            metrics.serve(args.metrics_port)
+
+    if args.query_only:
+        # Open the existing collections only, indexing is left to a full run
+        try:
+            vector_store.cache_collections(categories)
+        except Exception as e:
+            print(f"Could not open the existing collections, run rag.py without --query-only to index first:\n{e}")
+            raise SystemExit(1)
+    else:
+        if args.rebuild:
+            print("Rebuilding the vector store from scratch...")
+            vector_store.delete_collections(categories)
+            if page_index is not None:
+                page_index.clear()
+            document_manifest.clear()
+        # Open the existing collections (creating any that are missing) and cache them
+        vector_store.create_collections(categories)
+        vector_store.cache_collections(categories)
 
-# RFP Example
-document_text = pdf_parser.parse_page_number(pdf_location)     
-add_text_to_vector_store_page_metadata(parsed_pages_data=document_text, source=pdf_metadata, summarize=False, chunk_size=300)
+        # RFP Example
+        index_document(pdf_location, pdf_metadata)
 
-# Start the interactive session
-interactive_chat()
+        # The ingest models are not needed while chatting, release their memory
+        zero_shot_classifier.unload()
+        summarizer.unload()
 
+    # Start the interactive session
+    try:
+        interactive_chat()
+    finally:
+        if query_router is not None and query_router.queries:
+            routing = query_router.summary()
+            print(f"Query routing: {routing['hit_rate']:.0%} of {routing['queries']} queries narrowed, "
+                  f"{routing['mean_collections_searched']:.1f} of {len(categories)} collections searched on average, "
+                  f"~{routing['estimated_seconds_saved'] * 1000:.0f}ms of search saved")
+        if metrics.enabled:
+            metrics.write_prometheus(metrics_prometheus_path)
+            print(f"Metrics written to {metrics_prometheus_path}")
+            metrics.close()